@@ -0,0 +1,50 @@
+"""Compares aggregating a synthetic run tree file by file with aggregating its packed archive
+
+Usage: python -m benchmarks.archive [--files-per-dir 20]
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from benchmarks.synthetic import make_run_tree
+from core.utils.aggregation import fold_mutation_files
+from core.utils.archive import ARCHIVE_EXTENSION, aggregate_archive, pack_directory
+from core.utils.directory_parsers import TopLevelDirectory
+
+
+def main(files_per_dir):
+    root = tempfile.mkdtemp()
+    try:
+        tree = os.path.join(root, 'tree')
+        archive_path = os.path.join(root, 'run' + ARCHIVE_EXTENSION)
+        n_files = make_run_tree(tree, files_per_dir=files_per_dir)
+
+        start = time.perf_counter()
+        pack_directory(tree, archive_path)
+        pack_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        tree_df = fold_mutation_files(TopLevelDirectory(tree).manifest).to_dataframe()
+        tree_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        archive_df = aggregate_archive(archive_path)
+        archive_seconds = time.perf_counter() - start
+
+        print('{} files, archive {} bytes, packed in {:.3f}s'.format(
+            n_files, os.path.getsize(archive_path), pack_seconds))
+        print('{:<10} {:>10}'.format('source', 'seconds'))
+        print('{:<10} {:>10.3f}'.format('tree', tree_seconds))
+        print('{:<10} {:>10.3f}'.format('archive', archive_seconds))
+        print('identical output: {}'.format(tree_df.equals(archive_df)))
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--files-per-dir', type=int, default=20)
+    args = parser.parse_args()
+    main(args.files_per_dir)
@@ -0,0 +1,74 @@
+"""Times merge_dataframes against the previous repeated pd.concat implementation
+
+Usage: python -m benchmarks.merge_dataframes [--sizes 1000 10000 100000] [--legacy-limit 10000]
+"""
+import argparse
+import random
+import time
+import tracemalloc
+
+import pandas as pd
+
+from core.utils.mutation_counters import get_grouping_columns, merge_dataframes
+
+headers = ['chr', 'pos', 'ref', 'alt', 'sample', 'oligo', 'mutation', 'count']
+samples = ['{}_{}'.format(timepoint, letter) for timepoint in ('48hr', '96hr', '6d', '8d', '12d') for letter in 'ABC']
+oligos = ['1A', '1C', '1G', '1T', '2', '3only']
+
+
+def synthetic_frames(n_files, rows_per_file=2, n_variants=50, seed=0):
+    """Returns one small frame per file, shaped like the output of convert_mutation_file_to_dataframe"""
+    rng = random.Random(seed)
+    variants = [('17', str(7578000 + 7 * index), 'ACGT'[index % 4], 'ACGT'[(index + 1) % 4])
+                for index in range(n_variants)]
+    frames = []
+    for _ in range(n_files):
+        sample, oligo = rng.choice(samples), rng.choice(oligos)
+        mutation, count = rng.choice(('DELETERIOUS', 'NON-DELETERIOUS')), rng.randint(1, 30)
+        rows = [list(rng.choice(variants)) + [sample, oligo, mutation, count] for _ in range(rows_per_file)]
+        frames.append(pd.DataFrame(rows, columns=headers))
+    return frames
+
+
+def legacy_merge_dataframes(df_list, group_criteria=None):
+    merged_df = df_list.pop(0)
+    for next_df in df_list:
+        merged_df = pd.concat((merged_df, next_df), axis=0, ignore_index=True)
+
+    return merged_df.groupby(get_grouping_columns(group_criteria), as_index=False)['count'].sum()
+
+
+def measure(merge, frames):
+    """Times the merge on its own, then repeats it under tracemalloc to find the memory it allocates"""
+    start = time.perf_counter()
+    merged_df = merge(list(frames))
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    merge(list(frames))
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak, merged_df
+
+
+def main(sizes, legacy_limit):
+    print('{:>8} {:>10} {:>12} {:>14} {:>8}'.format('files', 'engine', 'seconds', 'peak MiB', 'groups'))
+    for n_files in sizes:
+        frames = synthetic_frames(n_files)
+        elapsed, peak, merged_df = measure(merge_dataframes, frames)
+        print('{:>8} {:>10} {:>12.3f} {:>14.1f} {:>8}'.format(n_files, 'batched', elapsed, peak / 2 ** 20,
+                                                                merged_df.shape[0]), flush=True)
+        if n_files <= legacy_limit:
+            elapsed, peak, legacy_df = measure(legacy_merge_dataframes, frames)
+            assert legacy_df.equals(merged_df)
+            print('{:>8} {:>10} {:>12.3f} {:>14.1f} {:>8}'.format(n_files, 'legacy', elapsed, peak / 2 ** 20,
+                                                                    legacy_df.shape[0]), flush=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--legacy-limit', type=int, default=10000,
+                        help='largest input given to the quadratic implementation')
+    args = parser.parse_args()
+    main(args.sizes, args.legacy_limit)
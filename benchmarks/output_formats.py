@@ -0,0 +1,47 @@
+"""Compares write time, read-back time and file size of each counts.py output format
+
+Usage: python -m benchmarks.output_formats [--files-per-dir 50] [--variants-per-file 20] [--n-variants 2000]
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from benchmarks.synthetic import make_run_tree
+from core.utils.aggregation import aggregate_mutation_files
+from core.utils.directory_parsers import TopLevelDirectory
+from core.utils.writers import OUTPUT_FORMATS, read_counts, write_counts
+
+
+def main(files_per_dir, variants_per_file, n_variants):
+    root = tempfile.mkdtemp()
+    try:
+        tree_dir = os.path.join(root, 'tree')
+        n_files = make_run_tree(tree_dir, files_per_dir=files_per_dir, variants_per_file=variants_per_file,
+                                n_variants=n_variants)
+        df = aggregate_mutation_files(TopLevelDirectory(tree_dir).manifest)
+        print('{} files, {} output rows'.format(n_files, df.shape[0]))
+        print('{:<8} {:>10} {:>10} {:>10}'.format('format', 'write s', 'read s', 'MiB'))
+        for output_format in OUTPUT_FORMATS:
+            output_path = os.path.join(root, 'counts.' + output_format)
+            start = time.perf_counter()
+            write_counts(df, output_path, output_format)
+            write_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            read_counts(output_path, output_format)
+            read_time = time.perf_counter() - start
+            print('{:<8} {:>10.3f} {:>10.3f} {:>10.2f}'.format(output_format, write_time, read_time,
+                                                                os.path.getsize(output_path) / 2 ** 20))
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--files-per-dir', type=int, default=50)
+    parser.add_argument('--variants-per-file', type=int, default=20)
+    parser.add_argument('--n-variants', type=int, default=2000)
+    args = parser.parse_args()
+    main(args.files_per_dir, args.variants_per_file, args.n_variants)
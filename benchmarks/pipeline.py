@@ -0,0 +1,135 @@
+"""Benchmarks each stage of the counts pipeline on a synthetic run tree and saves the timings as JSON
+
+Stages are timed in this process (discovery, parsing, merging, writing); the full run is a separate
+counts.py process so that its peak RSS is its own. Passing --baseline compares against an earlier
+JSON result and exits non-zero if any stage is slower by more than --tolerance.
+
+Usage: python -m benchmarks.pipeline --output bench.json [--baseline previous.json] [--files-per-dir 20]
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import default_oligos, default_samples, default_timepoints, make_run_tree
+from core.utils.directory_parsers import TopLevelDirectory
+from core.utils.mutation_counters import convert_mutation_file_to_dataframe, merge_dataframes
+from core.utils.writers import write_counts
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+
+def peak_rss_mb(who=resource.RUSAGE_SELF):
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    divisor = 2 ** 20 if sys.platform == 'darwin' else 2 ** 10
+    return resource.getrusage(who).ru_maxrss / divisor
+
+
+def run_stages(tree_dir, output_path):
+    stages = {}
+
+    def record(name, start):
+        stages[name] = {'seconds': time.perf_counter() - start, 'peak_rss_mb': peak_rss_mb()}
+
+    start = time.perf_counter()
+    manifest = TopLevelDirectory(tree_dir).manifest
+    record('discovery', start)
+
+    start = time.perf_counter()
+    dfs = [convert_mutation_file_to_dataframe(mutation_file) for mutation_file in manifest]
+    record('parsing', start)
+
+    start = time.perf_counter()
+    merged_df = merge_dataframes(dfs)
+    record('merging', start)
+
+    start = time.perf_counter()
+    write_counts(merged_df, output_path)
+    record('writing', start)
+
+    start = time.perf_counter()
+    subprocess.run([sys.executable, os.path.join(repo_dir, 'counts.py'), '-d', tree_dir, '-o', output_path],
+                   check=True, cwd=repo_dir)
+    stages['full_run'] = {'seconds': time.perf_counter() - start,
+                          'peak_rss_mb': peak_rss_mb(resource.RUSAGE_CHILDREN)}
+
+    return stages, len(manifest), merged_df.shape[0]
+
+
+def compare(result, baseline, tolerance):
+    """Returns (stage, ratio) for every stage at least tolerance times slower than in the baseline"""
+    regressions = []
+    for stage, timing in result['stages'].items():
+        baseline_timing = baseline['stages'].get(stage)
+        if baseline_timing and baseline_timing['seconds'] > 0:
+            ratio = timing['seconds'] / baseline_timing['seconds']
+            print('{:<10} {:>9.3f}s vs {:>9.3f}s  x{:.2f}'.format(stage, timing['seconds'],
+                                                                  baseline_timing['seconds'], ratio))
+            if ratio > tolerance:
+                regressions.append((stage, ratio))
+    return regressions
+
+
+def main(args):
+    config = {
+        'timepoints': args.timepoints, 'samples': args.samples, 'oligos': args.oligos,
+        'files_per_dir': args.files_per_dir, 'variants_per_file': args.variants_per_file,
+        'n_variants': args.n_variants, 'seed': args.seed
+    }
+    root = tempfile.mkdtemp()
+    try:
+        tree_dir = os.path.join(root, 'tree')
+        make_run_tree(tree_dir, args.timepoints, args.samples, args.oligos, args.files_per_dir,
+                      args.variants_per_file, n_variants=args.n_variants, seed=args.seed)
+        stages, n_files, n_rows = run_stages(tree_dir, os.path.join(root, 'output.tsv'))
+    finally:
+        shutil.rmtree(root)
+
+    result = {
+        'config': config,
+        'environment': {'python': platform.python_version(), 'pandas': pd.__version__, 'numpy': np.__version__,
+                        'platform': platform.platform()},
+        'files': n_files,
+        'output_rows': n_rows,
+        'stages': stages
+    }
+    for stage, timing in stages.items():
+        print('{:<10} {:>9.3f}s {:>9.1f} MiB peak RSS'.format(stage, timing['seconds'], timing['peak_rss_mb']))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(result, json.load(f), args.tolerance)
+        if regressions:
+            print('regressions: {}'.format(', '.join('{} x{:.2f}'.format(*regression)
+                                                     for regression in regressions)))
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--timepoints', nargs='+', default=list(default_timepoints))
+    parser.add_argument('--samples', nargs='+', default=list(default_samples))
+    parser.add_argument('--oligos', nargs='+', default=list(default_oligos))
+    parser.add_argument('--files-per-dir', type=int, default=20)
+    parser.add_argument('--variants-per-file', type=int, default=2)
+    parser.add_argument('--n-variants', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', '-o', type=str, help='JSON file to save the results to')
+    parser.add_argument('--baseline', type=str, help='earlier JSON result to compare against')
+    parser.add_argument('--tolerance', type=float, default=1.25,
+                        help='slowdown ratio above which a stage counts as a regression')
+    sys.exit(main(parser.parse_args()))
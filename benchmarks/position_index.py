@@ -0,0 +1,76 @@
+"""Measures region query latency on a large position index against filtering the full TSV with pandas
+
+Usage: python -m benchmarks.position_index [--n-variants 200000] [--queries 200]
+"""
+import argparse
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.merge_dataframes import oligos, samples
+from core.utils.position_index import CountIndex
+from core.utils.writers import write_counts
+
+tp53_start = 7571720
+
+
+def synthetic_counts(n_variants, seed=0):
+    """Merged counts for n_variants substitutions around TP53, each seen in a few sample/oligo combinations"""
+    rng = np.random.RandomState(seed)
+    n_rows = n_variants * 4
+    bases = np.array(['A', 'C', 'G', 'T'], dtype=object)
+    df = pd.DataFrame({
+        'chr': '17',
+        'pos': tp53_start + np.repeat(np.arange(n_variants), 4),
+        'ref': bases[rng.randint(0, 4, n_rows)],
+        'alt': bases[rng.randint(0, 4, n_rows)],
+        'sample': np.array(samples, dtype=object)[rng.randint(0, len(samples), n_rows)],
+        'oligo': np.array(oligos, dtype=object)[rng.randint(0, len(oligos), n_rows)],
+        'mutation': np.array(['DELETERIOUS', 'NON-DELETERIOUS'], dtype=object)[rng.randint(0, 2, n_rows)],
+        'count': rng.randint(1, 100, n_rows)
+    })
+    return df.drop_duplicates(subset=['chr', 'pos', 'ref', 'alt', 'sample', 'oligo', 'mutation'])
+
+
+def main(n_variants, n_queries):
+    root = tempfile.mkdtemp()
+    try:
+        df = synthetic_counts(n_variants)
+        index_path = os.path.join(root, 'counts.tp53idx')
+        tsv_path = os.path.join(root, 'counts.tsv')
+        write_counts(df, index_path)
+        write_counts(df, tsv_path)
+        sample = df['sample'].iloc[0]
+        starts = np.random.RandomState(1).randint(tp53_start, tp53_start + n_variants - 150, n_queries)
+
+        latencies = []
+        with CountIndex(index_path) as count_index:
+            for start in starts:
+                query_start = time.perf_counter()
+                count_index.query('chr17', int(start), int(start) + 150, sample=sample)
+                latencies.append(time.perf_counter() - query_start)
+
+        query_start = time.perf_counter()
+        full_df = pd.read_csv(tsv_path, sep='\t')
+        full_df[(full_df['pos'] >= starts[0]) & (full_df['pos'] <= starts[0] + 150) & (full_df['sample'] == sample)]
+        tsv_seconds = time.perf_counter() - query_start
+
+        print('{} rows, {} queries of 150 bp in one sample'.format(df.shape[0], n_queries))
+        print('index median {:.1f} us, max {:.1f} us'.format(statistics.median(latencies) * 1e6,
+                                                             max(latencies) * 1e6))
+        print('tsv load + filter {:.3f} s'.format(tsv_seconds))
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--n-variants', type=int, default=200000)
+    parser.add_argument('--queries', type=int, default=200)
+    args = parser.parse_args()
+    main(args.n_variants, args.queries)
@@ -0,0 +1,42 @@
+"""Compares the per-file cost of the mut_id readers on a tree of small synthetic files
+
+Usage: python -m benchmarks.readers [--files-per-dir 20]
+"""
+import argparse
+import shutil
+import tempfile
+import time
+
+from benchmarks.synthetic import make_run_tree
+from core.utils.directory_parsers import TopLevelDirectory
+from core.utils.mutation_counters import convert_mutation_file_to_dataframe, read_mutation_file, read_variant_rows
+
+readers = (
+    ('convert_mutation_file_to_dataframe', convert_mutation_file_to_dataframe),
+    ('read_mutation_file', read_mutation_file),
+    ('read_variant_rows', lambda record: read_variant_rows(record.path)),
+)
+
+
+def main(files_per_dir):
+    root = tempfile.mkdtemp()
+    try:
+        make_run_tree(root, files_per_dir=files_per_dir)
+        manifest = TopLevelDirectory(root).manifest
+        print('{} files'.format(len(manifest)))
+        print('{:<36} {:>10} {:>14}'.format('reader', 'seconds', 'us per file'))
+        for name, reader in readers:
+            start = time.perf_counter()
+            for record in manifest:
+                reader(record)
+            elapsed = time.perf_counter() - start
+            print('{:<36} {:>10.3f} {:>14.1f}'.format(name, elapsed, elapsed / len(manifest) * 1e6))
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--files-per-dir', type=int, default=20)
+    args = parser.parse_args()
+    main(args.files_per_dir)
@@ -0,0 +1,53 @@
+"""Builds synthetic run trees that match the TopLevelDirectory naming patterns"""
+import os
+import random
+
+header = 'Variant\tSIFT_score\tSIFT_term\tPolyPhen_score\tPolyPhen_term\tErica_term\n'
+default_timepoints = ('48hr', '96hr', '6d', '8d', '12d')
+default_samples = ('A', 'B', 'C')
+default_oligos = ('1A', '1C', '1G', '1T', '2', '3only')
+mutation_types = ('DELETERIOUS', 'NON-DELETERIOUS')
+
+
+def timepoint_directory(timepoint):
+    return '{}_final2'.format(timepoint) if timepoint == '12d' else '{}_final'.format(timepoint)
+
+
+def synthetic_variants(n_variants, start=7571720):
+    """Single-base substitutions spread across the TP53 locus on chromosome 17"""
+    return ['17_{}_{}/{}'.format(start + 11 * index, 'ACGT'[index % 4], 'ACGT'[(index // 4 + index + 1) % 4])
+            for index in range(n_variants)]
+
+
+def make_run_tree(root, timepoints=default_timepoints, samples=default_samples, oligos=default_oligos,
+                  files_per_dir=20, variants_per_file=2, barcodes_per_file=3, n_variants=500, seed=0):
+    """Writes files_per_dir mut_id files into every DELETERIOUS/NON-DELETERIOUS directory and returns their count"""
+    rng = random.Random(seed)
+    variants = synthetic_variants(n_variants)
+    n_files = 0
+    for timepoint in timepoints:
+        for sample in samples:
+            sample_dir = 'vcfs_{}_{}'.format(timepoint, sample)
+            for oligo in oligos:
+                oligo_dir = os.path.join(root, timepoint_directory(timepoint), sample_dir,
+                                         '{}_oligo{}'.format(sample_dir, oligo))
+                for mutation in mutation_types:
+                    mutation_dir = os.path.join(oligo_dir, mutation)
+                    os.makedirs(mutation_dir, exist_ok=True)
+                    for mut_id in range(1, files_per_dir + 1):
+                        file_name = 'mut_id{}_{}.txt'.format(mut_id, rng.randint(1, 50))
+                        _write_mutation_file(os.path.join(mutation_dir, file_name), rng, variants, mutation,
+                                             variants_per_file, barcodes_per_file)
+                        n_files += 1
+
+    return n_files
+
+
+def _write_mutation_file(file_path, rng, variants, mutation, variants_per_file, barcodes_per_file):
+    lines = ['{}\t-\t-\t-\t-\tBARCODE\n'.format(rng.choice(variants)) for _ in range(barcodes_per_file)]
+    lines.extend('{}\t0.0\tdeleterious\t0.722\tpossibly_damaging\t{}\n'.format(rng.choice(variants), mutation)
+                 for _ in range(variants_per_file))
+    rng.shuffle(lines)
+    with open(file_path, 'w') as f:
+        f.write(header)
+        f.writelines(lines)
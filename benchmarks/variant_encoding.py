@@ -0,0 +1,84 @@
+"""Compares a pandas groupby on string columns with the integer-encoded aggregation
+
+Both a one-off aggregation and a running merge over batches (as in merge_dataframes) are timed, and the
+memory of the aggregated table is compared with that of its packed keys and counts.
+
+Usage: python -m benchmarks.variant_encoding [--rows 100000 1000000] [--batch-rows 20000]
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.merge_dataframes import headers, oligos, samples
+from core.utils.mutation_counters import get_grouping_columns
+from core.utils.variant_encoding import EncodedCounts, aggregate_encoded
+
+
+def synthetic_rows(n_rows, n_variants=2000, seed=0):
+    """A concatenation of parsed files: string chr/pos/ref/alt plus sample, oligo, mutation and count"""
+    rng = np.random.default_rng(seed)
+    variant_index = rng.integers(0, n_variants, n_rows)
+    bases = np.array(['A', 'C', 'G', 'T'], dtype=object)
+    return pd.DataFrame({
+        'chr': np.full(n_rows, '17', dtype=object),
+        'pos': (7571720 + 11 * variant_index).astype(str).astype(object),
+        'ref': bases[variant_index % 4],
+        'alt': bases[(variant_index // 4 + variant_index + 1) % 4],
+        'sample': np.array(samples, dtype=object)[rng.integers(0, len(samples), n_rows)],
+        'oligo': np.array(oligos, dtype=object)[rng.integers(0, len(oligos), n_rows)],
+        'mutation': np.array(['DELETERIOUS', 'NON-DELETERIOUS'], dtype=object)[rng.integers(0, 2, n_rows)],
+        'count': rng.integers(1, 50, n_rows)
+    }, columns=headers)
+
+
+def string_fold(df, grouping, batch_rows):
+    """The previous running merge: concat the string-keyed aggregate with each batch and groupby again"""
+    merged_df = None
+    for start in range(0, df.shape[0], batch_rows):
+        frames = [df.iloc[start:start + batch_rows]] if merged_df is None else [merged_df,
+                                                                                 df.iloc[start:start + batch_rows]]
+        merged_df = pd.concat(frames, ignore_index=True).groupby(grouping, as_index=False)['count'].sum()
+    return merged_df
+
+
+def encoded_fold(df, grouping, batch_rows):
+    encoded_counts = EncodedCounts(grouping)
+    for start in range(0, df.shape[0], batch_rows):
+        encoded_counts.add(df.iloc[start:start + batch_rows])
+    return encoded_counts
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+def main(row_counts, batch_rows):
+    grouping = get_grouping_columns()
+    print('{:>9} {:>9} {:>12} {:>12} {:>12} {:>12} {:>12} {:>12}'.format(
+        'rows', 'groups', 'string MiB', 'encoded MiB', 'groupby s', 'encoded s', 'str fold s', 'enc fold s'))
+    for n_rows in row_counts:
+        df = synthetic_rows(n_rows)
+        groupby_time, expected_df = timed(lambda: df.groupby(grouping, as_index=False)['count'].sum())
+        encoded_time, encoded_df = timed(aggregate_encoded, df, grouping)
+        string_fold_time, folded_df = timed(string_fold, df, grouping, batch_rows)
+        encoded_fold_time, encoded_counts = timed(encoded_fold, df, grouping, batch_rows)
+        assert expected_df.equals(encoded_df) and expected_df.equals(folded_df)
+        assert expected_df.equals(encoded_counts.to_dataframe())
+
+        string_bytes = expected_df.memory_usage(index=False, deep=True).sum()
+        encoded_bytes = encoded_counts.keys.nbytes + encoded_counts.counts.nbytes
+        print('{:>9} {:>9} {:>12.2f} {:>12.2f} {:>12.3f} {:>12.3f} {:>12.3f} {:>12.3f}'.format(
+            n_rows, expected_df.shape[0], string_bytes / 2 ** 20, encoded_bytes / 2 ** 20, groupby_time,
+            encoded_time, string_fold_time, encoded_fold_time))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, nargs='+', default=[100000, 1000000, 5000000])
+    parser.add_argument('--batch-rows', type=int, default=20000, help='rows per fold in the running merges')
+    args = parser.parse_args()
+    main(args.rows, args.batch_rows)
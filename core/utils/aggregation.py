@@ -0,0 +1,131 @@
+import time
+from collections import defaultdict
+
+import pandas as pd
+
+from core.utils.mutation_counters import as_record, get_grouping_columns, parse_variant_rows, read_variant_rows
+
+full_grouping = get_grouping_columns()
+
+
+class CountAggregator:
+    """Running count totals keyed on the grouping columns, folded in one file at a time
+
+    Memory is proportional to the number of distinct groups, not to the number of files added.
+    """
+
+    def __init__(self, group_criteria=None):
+        self.grouping = get_grouping_columns(group_criteria)
+        self.counts = defaultdict(int)
+        self._projection = [full_grouping.index(column) for column in self.grouping]
+
+    def add_dataframe(self, df):
+        for key, count in zip(zip(*[df[column] for column in self.grouping]), df['count']):
+            self.counts[key] += int(count)
+
+    def add_mutation_file(self, mutation_file, profiler=None):
+        """Reads a mut_id file with the lean row reader and adds its count to every variant it lists"""
+        record = as_record(mutation_file)
+        if profiler is None:
+            rows = read_variant_rows(record.path)
+        else:
+            tally = {'rows_read': 0, 'barcode_rows': 0}
+            start = time.perf_counter()
+            rows = read_variant_rows(record.path, tally)
+            profiler.file_parsed(record, time.perf_counter() - start, **tally)
+        self.add_variant_rows(record, rows)
+
+    def add_mutation_buffer(self, mutation_file, data, profiler=None, read_seconds=0.0):
+        """Same as add_mutation_file for the bytes of a file that has already been read, e.g. by a prefetcher"""
+        record = as_record(mutation_file)
+        if profiler is None:
+            rows = parse_variant_rows(data.decode().splitlines())
+        else:
+            tally = {'rows_read': 0, 'barcode_rows': 0}
+            start = time.perf_counter()
+            rows = parse_variant_rows(data.decode().splitlines(), tally)
+            profiler.file_parsed(record, read_seconds, time.perf_counter() - start, **tally)
+        self.add_variant_rows(record, rows)
+
+    def add_variant_rows(self, record, rows):
+        """Adds record.count to every (chr, pos, ref, alt, mutation) row read from record's file"""
+        file_values = {'sample': record.sample, 'oligo': record.oligo}
+        extra_columns = self.grouping[4:]
+        for chrom, pos, ref, alt, mutation in rows:
+            file_values['mutation'] = mutation
+            self.counts[(chrom, pos, ref, alt) + tuple(file_values[column] for column in extra_columns)] += \
+                record.count
+
+    def add_contribution(self, contribution):
+        """Adds a file contribution, i.e. (key, count) pairs keyed on every column of the ungrouped output"""
+        if len(self._projection) == len(full_grouping):
+            self.add_rows(contribution)
+            return
+
+        projection = self._projection
+        for key, count in contribution:
+            self.counts[tuple(key[index] for index in projection)] += count
+
+    def remove_contribution(self, contribution):
+        """Takes a previously added file contribution back out, dropping groups whose count falls to zero"""
+        projection = self._projection
+        for key, count in contribution:
+            key = tuple(key[index] for index in projection)
+            self.counts[key] -= count
+            if not self.counts[key]:
+                del self.counts[key]
+
+    def add_rows(self, rows):
+        """Adds (key, count) pairs where key follows the order of self.grouping"""
+        for key, count in rows:
+            self.counts[key] += count
+
+    def __len__(self):
+        return len(self.counts)
+
+    def to_dataframe(self):
+        """Returns the totals in the same row order and layout as merge_dataframes"""
+        keys = sorted(self.counts)
+        df = pd.DataFrame(keys, columns=self.grouping) if keys else pd.DataFrame(columns=self.grouping)
+        df['count'] = pd.Series([self.counts[key] for key in keys], dtype='int64')
+        return df
+
+
+def file_contribution(mutation_file, profiler=None):
+    """Returns a file's counts keyed on every output column, the finest grain any grouping can be rolled up from"""
+    aggregator = CountAggregator()
+    aggregator.add_mutation_file(mutation_file, profiler)
+    return list(aggregator.counts.items())
+
+
+def buffer_contribution(mutation_file, data, profiler=None, read_seconds=0.0):
+    """Same as file_contribution for the bytes of a file that has already been read"""
+    aggregator = CountAggregator()
+    aggregator.add_mutation_buffer(mutation_file, data, profiler, read_seconds)
+    return list(aggregator.counts.items())
+
+
+def file_contributions(mutation_files):
+    return [file_contribution(mutation_file) for mutation_file in mutation_files]
+
+
+def aggregate_mutation_files(mutation_files, group_criteria=None, profiler=None):
+    """Parses a chunk of mutation files and returns their already-merged counts"""
+    return fold_mutation_files(mutation_files, group_criteria, profiler).to_dataframe()
+
+
+def fold_mutation_files(mutation_files, group_criteria=None, profiler=None):
+    aggregator = CountAggregator(group_criteria)
+    for mutation_file in mutation_files:
+        aggregator.add_mutation_file(mutation_file, profiler)
+
+    return aggregator
+
+
+def aggregate_stream(dfs, group_criteria=None):
+    """Folds each dataframe from an iterable into a CountAggregator, discarding it straight away"""
+    aggregator = CountAggregator(group_criteria)
+    for df in dfs:
+        aggregator.add_dataframe(df)
+
+    return aggregator.to_dataframe()
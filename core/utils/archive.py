@@ -0,0 +1,158 @@
+"""Packs a whole run tree into one file that is read back through a memory map
+
+Layout: the container format of core.utils.container, whose single data block holds the RECORD_DTYPE variant
+records. The header holds the metadata parsed from every mut_id path (timepoint, sample, oligo, class, mut_id,
+count, plus size and mtime) and the label tables the records point into; records are grouped by file, in manifest
+order.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from core.utils.container import close_mapped, open_mapped, write_header
+from core.utils.directory_parsers import TopLevelDirectory
+from core.utils.manifest import Manifest, MutationFileRecord
+from core.utils.mutation_counters import get_grouping_columns, read_variant_rows
+
+MAGIC = b'TP53PACK'
+VERSION = 2
+ARCHIVE_EXTENSION = '.tp53pack'
+RECORD_DTYPE = np.dtype([('file', '<u4'), ('variant', '<u4'), ('mutation', '<u2')])
+file_fields = MutationFileRecord.fields
+
+
+def is_archive(path):
+    """True if path is a file starting with the archive magic"""
+    if not os.path.isfile(path):
+        return False
+    with open(path, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def pack_directory(dir_name, archive_path):
+    """Parses every mutation file under dir_name once and writes them all to a single archive; returns its manifest"""
+    manifest = TopLevelDirectory(dir_name).manifest
+    pack_manifest(manifest, archive_path, root=dir_name)
+    return manifest
+
+
+def pack_manifest(manifest, archive_path, root=''):
+    variants = {}
+    mutations = {}
+    columns = {'file': [], 'variant': [], 'mutation': []}
+    for file_index, record in enumerate(manifest):
+        for chrom, pos, ref, alt, mutation in read_variant_rows(record.path):
+            columns['file'].append(file_index)
+            columns['variant'].append(variants.setdefault((chrom, pos, ref, alt), len(variants)))
+            columns['mutation'].append(mutations.setdefault(mutation, len(mutations)))
+
+    records = np.empty(len(columns['file']), dtype=RECORD_DTYPE)
+    for column, values in columns.items():
+        records[column] = values
+
+    header = {
+        'root': os.path.abspath(root) if root else '',
+        'files': {field: [_relative_path(record.path, root) if field == 'path' else getattr(record, field)
+                          for record in manifest]
+                  for field in file_fields},
+        'variants': [list(variant) for variant in variants],
+        'mutations': list(mutations),
+        'n_records': int(records.size)
+    }
+    temp_path = archive_path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        write_header(f, MAGIC, VERSION, header)
+        f.write(records.tobytes())
+    os.replace(temp_path, archive_path)
+
+
+class PackedRun:
+    """A packed run tree opened through a read-only memory map
+
+    records is a zero-copy NumPy view of the archive's record block, so opening an archive costs one
+    JSON header parse however many variant records it holds. Use as a context manager, or call close().
+    Views taken from records should not outlive the context: the map cannot be unmapped while they exist, so
+    close() then leaves it to be released when the last of them is freed.
+    """
+
+    def __init__(self, archive_path):
+        self.archive_path = archive_path
+        self._mmap, self.header, records_start = open_mapped(archive_path, MAGIC, VERSION, 'packed run archive')
+        self.records = np.frombuffer(self._mmap, dtype=RECORD_DTYPE, count=self.header['n_records'],
+                                     offset=records_start)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+    def close(self):
+        self.records = None
+        close_mapped(self._mmap)
+
+    def __len__(self):
+        return len(self.header['files']['path'])
+
+    @property
+    def manifest(self):
+        """The packed files' metadata as a Manifest, with paths as they were under the packed root"""
+        files = self.header['files']
+        root = self.header['root']
+        return Manifest(
+            MutationFileRecord(os.path.join(root, path), *values)
+            for path, *values in zip(*[files[field] for field in file_fields]))
+
+    def aggregate(self, group_criteria=None):
+        """Sums the packed counts per grouping; same columns, values and row order as merge_dataframes"""
+        grouping = get_grouping_columns(group_criteria)
+        if not self.records.size:
+            return pd.DataFrame(columns=grouping + ['count'])
+
+        files = self.header['files']
+        file_index = self.records['file']
+        samples = ['_'.join(labels) for labels in zip(files['timepoint'], files['sample_letter'])]
+
+        code_columns = [('variant', self.records['variant'], None)]
+        for column in grouping[4:]:
+            if column == 'mutation':
+                code_columns.append((column, self.records['mutation'], self.header['mutations']))
+            else:
+                codes, labels = pd.factorize(np.array(samples if column == 'sample' else files['oligo'],
+                                                      dtype=object))
+                code_columns.append((column, codes.astype(np.int64)[file_index], labels))
+
+        keys = np.zeros(self.records.size, dtype=np.int64)
+        radixes = []
+        for column, codes, labels in code_columns:
+            radix = len(self.header['variants']) if labels is None else len(labels)
+            keys = keys * radix + codes
+            radixes.append(radix)
+
+        unique_keys, inverse = np.unique(keys, return_inverse=True)
+        totals = np.zeros(unique_keys.size, dtype=np.int64)
+        np.add.at(totals, inverse.ravel(), np.array(files['count'], dtype=np.int64)[file_index])
+
+        decoded = {}
+        remaining = unique_keys
+        for (column, _, labels), radix in reversed(list(zip(code_columns[1:], radixes[1:]))):
+            decoded[column] = np.array(labels, dtype=object)[remaining % radix]
+            remaining = remaining // radix
+        variant_labels = list(zip(*self.header['variants']))
+        for column, labels in zip(grouping[:4], variant_labels):
+            decoded[column] = np.array(labels, dtype=object)[remaining]
+
+        df = pd.DataFrame({column: decoded[column] for column in grouping})
+        df['count'] = totals
+        return df.sort_values(grouping, kind='mergesort').reset_index(drop=True)
+
+
+def aggregate_archive(archive_path, group_criteria=None):
+    with PackedRun(archive_path) as packed_run:
+        return packed_run.aggregate(group_criteria)
+
+
+def _relative_path(path, root):
+    return os.path.relpath(path, root) if root else path
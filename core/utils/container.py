@@ -0,0 +1,57 @@
+"""The file layout shared by packed run archives and position indexes
+
+Layout: an 8-byte magic, a little-endian uint32 version and uint64 header length, a JSON header, then the
+format's data blocks, each starting on an ALIGNMENT-byte boundary so they can be viewed in place from a memory map.
+"""
+import json
+import mmap
+import struct
+
+ALIGNMENT = 8
+_preamble = struct.Struct('<IQ')
+
+
+def write_header(f, magic, version, header):
+    """Writes the magic, version and JSON header to a file opened for binary writing, padded for the first block"""
+    header_bytes = json.dumps(header).encode()
+    f.write(magic)
+    f.write(_preamble.pack(version, len(header_bytes)))
+    f.write(header_bytes)
+    pad(f)
+
+
+def pad(f):
+    f.write(b'\0' * (-f.tell() % ALIGNMENT))
+
+
+def aligned(offset):
+    return offset + -offset % ALIGNMENT
+
+
+def open_mapped(path, magic, version, description):
+    """Memory-maps path read-only and returns (map, JSON header, offset of the first data block)
+
+    Raises ValueError, naming the file with description, if the magic or version does not match.
+    """
+    with open(path, 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    if mapped[:len(magic)] != magic:
+        mapped.close()
+        raise ValueError('{} is not a {}'.format(path, description))
+    file_version, header_size = _preamble.unpack_from(mapped, len(magic))
+    if file_version != version:
+        mapped.close()
+        raise ValueError('unsupported {} version {} in {}'.format(description, file_version, path))
+
+    header_start = len(magic) + _preamble.size
+    header = json.loads(mapped[header_start:header_start + header_size].decode())
+    return mapped, header, aligned(header_start + header_size)
+
+
+def close_mapped(mapped):
+    """Closes a map, unless NumPy views of it are still alive, in which case it is released with the last of them"""
+    try:
+        mapped.close()
+    except BufferError:
+        pass
@@ -1,62 +1,107 @@
 import os
 import re
+import time
+from collections import namedtuple
+
+from core.utils.manifest import Manifest
+from core.utils.sharding import in_shard
+
+DirectoryWalk = namedtuple('DirectoryWalk', ['first_level_subdirectories', 'second_level_subdirectories',
+                                             'third_level_subdirectories', 'mutation_subdirectories',
+                                             'mutation_files'])
 
 
 class TopLevelDirectory:
 
-    vcf_string = 'vcfs_\d{1,2}(hr|d)_[A-C]'
-    first_level_regex = re.compile('\d{1,2}(hr|d)_final(2)?')
+    vcf_string = r'vcfs_\d{1,2}(hr|d)_[A-C]'
+    first_level_regex = re.compile(r'\d{1,2}(hr|d)_final(2)?')
     second_level_regex = re.compile(vcf_string)
     third_level_regex = re.compile(vcf_string + '_oligo(1A|1C|1G|1T|2|3only)')
-    mutation_file_regex = re.compile('mut_id\d+_\d+\.txt')
+    mutation_file_regex = re.compile(r'mut_id\d+_\d+\.txt')
+    mutation_types = ('DELETERIOUS', 'NON-DELETERIOUS')
 
-    def __init__(self, path):
+    def __init__(self, path, shard=None):
         self.path = path
+        self.shard = shard
+        self.syscalls = 0
+        self.walk_time = 0.0
+        self._walk = None
+        self._manifest = None
+
+    def walk(self, refresh=False):
+        """Walks the whole tree once with os.scandir, caching the result on the instance
+
+        Given shard=(i, N), only the vcfs_<timepoint>_<sample> directories in shard i of N are walked below.
+        """
+        if self._walk is not None and not refresh:
+            return self._walk
+
+        self.syscalls = 0
+        start = time.perf_counter()
+
+        first_level = self._scan(self.path, self.first_level_regex)
+        second_level = [path for subdir in first_level for path in self._scan(subdir, self.second_level_regex)]
+        if self.shard is not None:
+            second_level = [path for path in second_level if in_shard(os.path.basename(path), self.shard)]
+        third_level = [path for subdir in second_level for path in self._scan(subdir, self.third_level_regex)]
+
+        mutation_subdirs = []
+        for third_level_subdir in third_level:
+            found = set(os.path.basename(path) for path in self._scan(third_level_subdir))
+            mutation_subdirs.extend([os.path.join(third_level_subdir, mutation) for mutation in self.mutation_types
+                                     if mutation in found])
+
+        mutation_files = [path for mutation_dir in mutation_subdirs
+                          for path in self._scan(mutation_dir, self.mutation_file_regex, want_dirs=False)]
+
+        self.walk_time = time.perf_counter() - start
+        self._walk = DirectoryWalk(first_level, second_level, third_level, mutation_subdirs, mutation_files)
+        self._manifest = None
+        return self._walk
+
+    def _scan(self, path, regex=None, want_dirs=True):
+        """Lists the entries of a single directory, using the DirEntry type info rather than extra stat calls"""
+        self.syscalls += 1
+        with os.scandir(path) as entries:
+            return [entry.path for entry in entries
+                    if (regex is None or regex.fullmatch(entry.name))
+                    and (entry.is_dir() if want_dirs else entry.is_file())]
+
+    @property
+    def manifest(self):
+        """Returns a Manifest with one record of parsed path metadata and size per mutation file"""
+        if self._manifest is None:
+            mutation_files = self.walk().mutation_files
+            self.syscalls += len(mutation_files)
+            self._manifest = Manifest.from_paths(mutation_files)
+
+        return self._manifest
+
+    @property
+    def stats(self):
+        return {'syscalls': self.syscalls, 'walk_time': self.walk_time}
 
     @property
     def first_level_subdirectories(self):
         """Given a top-level directory, will return a list of directories with the timepoint_final structure"""
-        dir_contents = os.listdir(self.path)
-
-        return [os.path.join(self.path, subdir) for subdir in
-                filter(lambda x: self.first_level_regex.fullmatch(x), dir_contents)]
+        return list(self.walk().first_level_subdirectories)
 
     @property
     def second_level_subdirectories(self):
-        """doc string"""
-        wanted_dirs = []
-        for subdir in self.first_level_subdirectories:
-            subdir_contents = os.listdir(subdir)
-            wanted_dirs.extend([os.path.join(subdir, other_dir) for other_dir in
-                                filter(lambda x: self.second_level_regex.fullmatch(x), subdir_contents)])
-
-        return wanted_dirs
+        """Returns the vcfs_timepoint_sample directories within each timepoint_final directory"""
+        return list(self.walk().second_level_subdirectories)
 
     @property
     def third_level_subdirectories(self):
-        wanted_dirs = []
-        for second_level_subdir in self.second_level_subdirectories:
-            subdir_contents = os.listdir(second_level_subdir)
-            wanted_dirs.extend([os.path.join(second_level_subdir, third_dir) for third_dir in
-                                filter(lambda x: self.third_level_regex.fullmatch(x), subdir_contents)])
-
-        return wanted_dirs
+        """Returns the vcfs_timepoint_sample_oligo directories within each sample directory"""
+        return list(self.walk().third_level_subdirectories)
 
     @property
     def mutation_subdirectories(self):
-        mutation_subdirs = [os.path.join(third_level_subdir, mutation) for third_level_subdir in
-                            self.third_level_subdirectories for mutation in ('DELETERIOUS', 'NON-DELETERIOUS')
-                            if os.path.exists(os.path.join(third_level_subdir, mutation))]
-
-        return mutation_subdirs
+        """Returns the DELETERIOUS and NON-DELETERIOUS directories that exist within each oligo directory"""
+        return list(self.walk().mutation_subdirectories)
 
     @property
     def mutation_files(self):
-        wanted_files = []
-        for mutation_dir in self.mutation_subdirectories:
-            dir_contents = os.listdir(mutation_dir)
-            wanted_files.extend([os.path.join(mutation_dir, file) for file in
-                                 filter(lambda x: self.mutation_file_regex.fullmatch(x), dir_contents)])
-
-        return wanted_files
-
+        """Returns the mut_id files within each mutation directory"""
+        return list(self.walk().mutation_files)
@@ -0,0 +1,101 @@
+import csv
+import os
+import sys
+
+
+class MutationFileRecord:
+    """Metadata for a single mut_id file, parsed once from its path"""
+
+    __slots__ = ('path', 'timepoint', 'sample_letter', 'oligo', 'mutation', 'mut_id', 'count', 'size', 'mtime')
+
+    fields = __slots__
+
+    def __init__(self, path, timepoint, sample_letter, oligo, mutation, mut_id, count, size=-1, mtime=-1):
+        self.path = path
+        self.timepoint = sys.intern(timepoint)
+        self.sample_letter = sys.intern(sample_letter)
+        self.oligo = sys.intern(oligo)
+        self.mutation = sys.intern(mutation)
+        self.mut_id = mut_id
+        self.count = count
+        self.size = size
+        self.mtime = mtime
+
+    @classmethod
+    def from_path(cls, file_path, size=-1, mtime=-1):
+        """Parses .../vcfs_<timepoint>_<sample>_oligo<oligo>/<mutation>/mut_id<id>_<count>.txt"""
+        dirs, file_name = os.path.split(file_path)
+        dir_with_info, mutation = dirs.split(os.sep)[-2:]
+        vcf_string, timepoint, sample_letter, oligo_name = dir_with_info.split('_')
+        mut_string, mut_id, count = os.path.splitext(file_name)[0].split('_')
+
+        return cls(file_path, timepoint, sample_letter, oligo_name[len('oligo'):], mutation,
+                   int(mut_id[len('id'):]), int(count), size, mtime)
+
+    @property
+    def sample(self):
+        return '_'.join((self.timepoint, self.sample_letter))
+
+    def __eq__(self, other):
+        return isinstance(other, MutationFileRecord) and all(
+            getattr(self, field) == getattr(other, field) for field in self.fields)
+
+    def __repr__(self):
+        return 'MutationFileRecord({})'.format(', '.join(
+            '{}={!r}'.format(field, getattr(self, field)) for field in self.fields))
+
+
+class Manifest:
+    """Ordered collection of MutationFileRecords that can be saved and reloaded between runs"""
+
+    int_fields = ('mut_id', 'count', 'size', 'mtime')
+
+    def __init__(self, records=()):
+        self.records = list(records)
+
+    @classmethod
+    def from_paths(cls, file_paths):
+        """Builds records for file_paths, taking each file's size and mtime (in ns) from a single stat call"""
+        records = []
+        for path in file_paths:
+            stat_result = os.stat(path)
+            records.append(MutationFileRecord.from_path(path, stat_result.st_size, stat_result.st_mtime_ns))
+        return cls(records)
+
+    @classmethod
+    def load(cls, manifest_path):
+        """Reads a manifest written by save"""
+        with open(manifest_path, newline='') as f:
+            reader = csv.reader(f, delimiter='\t')
+            header = tuple(next(reader, ()))
+            if header != MutationFileRecord.fields:
+                raise ValueError('{} is not a mutation file manifest: expected the columns {}'.format(
+                    manifest_path, ', '.join(MutationFileRecord.fields)))
+            int_columns = [header.index(field) for field in cls.int_fields]
+            records = []
+            for row in reader:
+                for column in int_columns:
+                    row[column] = int(row[column])
+                records.append(MutationFileRecord(*row))
+
+        return cls(records)
+
+    def save(self, manifest_path):
+        with open(manifest_path, 'w', newline='') as f:
+            writer = csv.writer(f, delimiter='\t', lineterminator='\n')
+            writer.writerow(MutationFileRecord.fields)
+            writer.writerows([getattr(record, field) for field in MutationFileRecord.fields]
+                             for record in self.records)
+
+    @property
+    def paths(self):
+        return [record.path for record in self.records]
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, index):
+        return self.records[index]
@@ -1,20 +1,32 @@
-import os
+import time
 
+import numpy as np
 import pandas as pd
 
+from core.utils.manifest import MutationFileRecord
+from core.utils.variant_encoding import EncodedCounts, NotEncodableError
+
+MERGE_BATCH_SIZE = 1000
 
-def convert_mutation_file_to_dataframe(file_path):
-    trimmed_df = _trim_and_rename_df(pd.read_csv(file_path, header=0, sep='\t'))
-    positional_df = _expand_variant_info_column(trimmed_df)
 
-    dirs, file_name = os.path.split(file_path)
-    dir_with_info = dirs.split(os.sep)[-2]
+def convert_mutation_file_to_dataframe(mutation_file, profiler=None):
+    """Accepts either a MutationFileRecord or the path to a mut_id file
 
-    sample_name, oligo_number = _get_sample_name_and_oligo_number(dir_with_info)
+    Given a profiler, the read_csv and variant-splitting times and row counts are reported to it.
+    """
+    record = as_record(mutation_file)
+    start = time.perf_counter() if profiler is not None else 0.0
+    raw_df = pd.read_csv(record.path, header=0, sep='\t')
+    read_done = time.perf_counter() if profiler is not None else 0.0
+    trimmed_df = _trim_and_rename_df(raw_df)
+    positional_df = _expand_variant_info_column(trimmed_df)
+    if profiler is not None:
+        profiler.file_parsed(record, read_done - start, time.perf_counter() - read_done,
+                             rows_read=raw_df.shape[0], barcode_rows=raw_df.shape[0] - trimmed_df.shape[0])
 
     full_df = _add_columns(
         positional_df,
-        *[('sample', sample_name), ('oligo', oligo_number), ('count', _get_count(file_name))]
+        *[('sample', record.sample), ('oligo', record.oligo), ('count', record.count)]
     )
     full_df = full_df.reset_index()
 
@@ -22,6 +34,76 @@ def convert_mutation_file_to_dataframe(file_path):
     return full_df[wanted_columns]
 
 
+def read_mutation_file(mutation_file):
+    """Lean alternative to convert_mutation_file_to_dataframe with compact dtypes
+
+    Only the Variant and Erica_term columns are kept, BARCODE rows are dropped while the file is read,
+    chr/ref/alt and the metadata columns are categorical and pos is an integer.
+    """
+    record = as_record(mutation_file)
+    rows = read_variant_rows(record.path)
+    chrs, positions, refs, alts, mutations = zip(*rows) if rows else ((), (), (), (), ())
+    n_rows = len(rows)
+
+    return pd.DataFrame({
+        'chr': pd.Categorical(chrs),
+        'pos': np.array(positions, dtype=np.int64),
+        'ref': pd.Categorical(refs),
+        'alt': pd.Categorical(alts),
+        'sample': pd.Categorical([record.sample] * n_rows),
+        'oligo': pd.Categorical([record.oligo] * n_rows),
+        'mutation': pd.Categorical(mutations),
+        'count': np.full(n_rows, record.count, dtype=np.int64)
+    })
+
+
+def read_variant_rows(file_path, tally=None):
+    """Returns (chr, pos, ref, alt, mutation) string tuples for every non-BARCODE row of a mut_id file
+
+    If a tally dict is given, its 'rows_read' and 'barcode_rows' entries are incremented.
+    """
+    with open(file_path) as f:
+        return parse_variant_rows(f, tally)
+
+
+def parse_variant_rows(lines, tally=None):
+    """Same as read_variant_rows for the lines of a mut_id file that has already been read, header first"""
+    name = getattr(lines, 'name', 'mutation file')
+    lines = iter(lines)
+    header = next(lines, '')
+    if not header:
+        raise ValueError('{} has no header'.format(name))
+    header = header.rstrip('\r\n').split('\t')
+    variant_index, term_index = header.index('Variant'), header.index('Erica_term')
+    n_splits = max(variant_index, term_index) + 1
+    rows = []
+    barcode_rows = 0
+    for line in lines:
+        fields = line.rstrip('\r\n').split('\t', n_splits)
+        if len(fields) <= term_index:
+            continue
+        mutation = fields[term_index]
+        if mutation == 'BARCODE':
+            barcode_rows += 1
+            continue
+        if not mutation:
+            continue
+        chrom, pos, base_change = fields[variant_index].split('_')
+        ref, alt = base_change.split('/')
+        rows.append((chrom, pos, ref, alt, mutation))
+
+    if tally is not None:
+        tally['rows_read'] += len(rows) + barcode_rows
+        tally['barcode_rows'] += barcode_rows
+    return rows
+
+
+def as_record(mutation_file):
+    if isinstance(mutation_file, MutationFileRecord):
+        return mutation_file
+    return MutationFileRecord.from_path(mutation_file)
+
+
 def _trim_and_rename_df(df):
     df = df.rename(index=str, columns={'Erica_term': 'mutation'})
     return df[df['mutation'] != 'BARCODE']
@@ -34,14 +116,6 @@ def _expand_variant_info_column(df):
     return df
 
 
-def _get_sample_name_and_oligo_number(dir_name_with_info):
-    vcf_string, timepoint, sample_letter, oligo_name = dir_name_with_info.split('_')
-    sample_name = '_'.join((timepoint, sample_letter))
-    oligo_number = oligo_name.lstrip('oligo')
-
-    return sample_name, oligo_number
-
-
 def _add_columns(df, *name_value_tuples):
     for two_tuple in name_value_tuples:
         col_name, value = two_tuple
@@ -50,20 +124,75 @@ def _add_columns(df, *name_value_tuples):
     return df
 
 
-def _get_count(file_name):
-    mut_string, sample_id, count = os.path.splitext(file_name)[0].split('_')
-    return int(count)
+def merge_dataframes(dfs, group_criteria=None, batch_size=MERGE_BATCH_SIZE):
+    """Sums the counts of any iterable of dataframes in a single pass
+
+    Frames are folded into a running aggregate batch_size at a time, so the input is never
+    concatenated in full and peak memory is bounded by the number of distinct groups plus one batch.
+    The running aggregate is kept integer-encoded (see core.utils.variant_encoding) until the end.
+    """
+    merger = _BatchMerger(get_grouping_columns(group_criteria))
+    batch = []
+    for df in dfs:
+        batch.append(df)
+        if len(batch) >= batch_size:
+            merger.fold(batch)
+            batch = []
+    merger.fold(batch)
+
+    return merger.result()
+
 
+def roll_up(merged_df, group_criteria=None):
+    """Re-aggregates an ungrouped merge result to a coarser grouping without re-reading any files"""
+    grouping = get_grouping_columns(group_criteria)
+    if grouping == list(merged_df.columns[:-1]):
+        return merged_df
+    return _group_counts(merged_df, grouping)
 
-def merge_dataframes(df_list, group_criteria=None):
-    merged_df = df_list.pop(0)
-    for next_df in df_list:
-        merged_df = pd.concat((merged_df, next_df), axis=0, ignore_index=True)
 
+def get_grouping_columns(group_criteria=None):
     grouping = ['chr', 'pos', 'ref', 'alt']
     if group_criteria:
         grouping.extend(group_criteria)
     else:
         grouping.extend(['sample', 'oligo', 'mutation'])
-    merged_df = merged_df.groupby(grouping, as_index=False).sum()
-    return merged_df
+    return grouping
+
+
+class _BatchMerger:
+    """Folds batches into EncodedCounts, switching to pandas groupby for good once a batch cannot be encoded"""
+
+    def __init__(self, grouping):
+        self.grouping = grouping
+        self.merged_df = None
+        try:
+            self.encoded = EncodedCounts(grouping)
+        except NotEncodableError:
+            self.encoded = None
+
+    def fold(self, batch):
+        if not batch:
+            return
+        df = pd.concat(batch, axis=0, ignore_index=True)
+        if self.encoded is not None:
+            try:
+                self.encoded.add(df)
+                return
+            except NotEncodableError:
+                self.merged_df = self.encoded.to_dataframe() if len(self.encoded) else None
+                self.encoded = None
+
+        frames = [df] if self.merged_df is None else [self.merged_df, df]
+        self.merged_df = _group_counts(pd.concat(frames, axis=0, ignore_index=True), self.grouping)
+
+    def result(self):
+        if self.encoded is not None and len(self.encoded):
+            return self.encoded.to_dataframe()
+        if self.merged_df is not None:
+            return self.merged_df
+        return pd.DataFrame(columns=self.grouping + ['count'])
+
+
+def _group_counts(df, grouping):
+    return df.groupby(grouping, as_index=False)['count'].sum()
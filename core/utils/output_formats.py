@@ -0,0 +1,9 @@
+OUTPUT_FORMATS = ('tsv', 'tsv.gz', 'parquet', 'feather', 'tp53idx')
+
+
+def infer_format(path):
+    """Picks the output format from the file extension, falling back to tsv"""
+    for output_format in sorted(OUTPUT_FORMATS, key=len, reverse=True):
+        if path.endswith('.' + output_format):
+            return output_format
+    return 'tsv'
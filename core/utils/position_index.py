@@ -0,0 +1,157 @@
+"""Merged counts stored sorted by chromosome and position, so regions can be looked up without reading the table
+
+Layout: the container format of core.utils.container, with one contiguous data block per output column. Label
+columns (chr, ref, alt, sample, oligo, mutation) are stored as uint32 codes into sorted label tables kept in the
+header, and pos/count as int64.
+Rows are ordered by chr, then numeric pos, then the remaining columns, and the header maps each chromosome to
+its row range, so a region query is a binary search on the memory-mapped pos array.
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+from core.utils.container import aligned, close_mapped, open_mapped, pad, write_header
+
+MAGIC = b'TP53IDX1'
+VERSION = 1
+integer_columns = ('pos', 'count')
+_region_regex = re.compile(r'(?P<chr>[^:]+)(:(?P<start>[\d,]+)(-(?P<end>[\d,]+))?)?')
+
+
+def write_index(df, path):
+    """Writes merged counts (any grouping) as a position index"""
+    columns = list(df.columns)
+    label_columns = [column for column in columns if column not in integer_columns]
+    try:
+        positions = pd.to_numeric(df['pos']).to_numpy(dtype=np.int64)
+    except (ValueError, TypeError):
+        raise ValueError('only integer positions can be indexed')
+
+    labels = {}
+    values = {'pos': positions, 'count': df['count'].to_numpy(dtype=np.int64)}
+    for column in label_columns:
+        strings = df[column].astype(str)
+        labels[column] = sorted(strings.unique())
+        values[column] = pd.Categorical(strings, categories=labels[column]).codes.astype(np.uint32)
+
+    sort_columns = ['chr', 'pos'] + [column for column in columns if column not in ('chr', 'pos', 'count')]
+    order = np.lexsort([values[column] for column in reversed(sort_columns)])
+    arrays = [values[column][order].astype(_column_dtype(column, labels)) for column in columns]
+
+    chr_codes = arrays[columns.index('chr')]
+    starts = np.searchsorted(chr_codes, np.arange(len(labels['chr'])), side='left')
+    ends = np.searchsorted(chr_codes, np.arange(len(labels['chr'])), side='right')
+    header = {
+        'columns': columns,
+        'labels': labels,
+        'chromosomes': {label: [int(start), int(end)] for label, start, end in zip(labels['chr'], starts, ends)},
+        'n_rows': len(order)
+    }
+    with open(path, 'wb') as f:
+        write_header(f, MAGIC, VERSION, header)
+        for array in arrays:
+            pad(f)
+            f.write(array.tobytes())
+
+
+def parse_region(region):
+    """Parses 'chr17:7578400-7578550', '17:7578424' or '17' into (chr, start, end), with None for open ends"""
+    match = _region_regex.fullmatch(region.strip())
+    if match is None:
+        raise ValueError('cannot parse region {!r}, expected chr[:start[-end]]'.format(region))
+    start, end = (int(match.group(name).replace(',', '')) if match.group(name) else None for name in ('start', 'end'))
+    return match.group('chr'), start, start if end is None else end
+
+
+class CountIndex:
+    """A position index opened through a read-only memory map; queries only touch the records they return"""
+
+    def __init__(self, path):
+        self.path = path
+        self._mmap, header, offset = open_mapped(path, MAGIC, VERSION, 'position index')
+        self.columns = header['columns']
+        self.chromosomes = header['chromosomes']
+        self.labels = {column: np.array(labels, dtype=object) for column, labels in header['labels'].items()}
+        self._codes = {column: {label: code for code, label in enumerate(labels)}
+                       for column, labels in header['labels'].items()}
+
+        self.n_rows = header['n_rows']
+        self.arrays = {}
+        for column in self.columns:
+            dtype = _column_dtype(column, self.labels)
+            offset = aligned(offset)
+            self.arrays[column] = np.frombuffer(self._mmap, dtype=dtype, count=self.n_rows, offset=offset)
+            offset += dtype.itemsize * self.n_rows
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+    def close(self):
+        self.arrays = None
+        close_mapped(self._mmap)
+
+    def __len__(self):
+        return self.n_rows
+
+    def query(self, chrom, start=None, end=None, **filters):
+        """Returns the rows on chrom with start <= pos <= end (both inclusive, None for open) as tuples
+
+        Keyword filters select label values, e.g. sample='12d_C'. Only the matching records are decoded.
+        """
+        first, last = self._span(chrom, start, end)
+        selected = slice(first, last)
+        matches = None
+        for column, value in filters.items():
+            if value is None:
+                continue
+            if column not in self._codes:
+                raise ValueError('the index has no {} column'.format(column))
+            code = self._codes[column].get(value)
+            if code is None:
+                return []
+            column_matches = self.arrays[column][first:last] == code
+            matches = column_matches if matches is None else matches & column_matches
+        if matches is not None:
+            selected = np.flatnonzero(matches) + first
+
+        decoded = [self.labels[column][self.arrays[column][selected]] if column in self.labels
+                   else self.arrays[column][selected].tolist() for column in self.columns]
+        return list(zip(*decoded))
+
+    def query_dataframe(self, chrom, start=None, end=None, **filters):
+        return pd.DataFrame(self.query(chrom, start, end, **filters), columns=self.columns)
+
+    def to_dataframe(self):
+        """Decodes every record, in index order"""
+        return pd.DataFrame({column: self.labels[column][self.arrays[column]] if column in self.labels
+                             else self.arrays[column].astype(np.int64) for column in self.columns})
+
+    def _span(self, chrom, start, end):
+        """Binary-searches the pos array within chrom's rows for the [first, last) rows between start and end"""
+        span = self.chromosomes.get(chrom)
+        if span is None and chrom.startswith('chr'):
+            span = self.chromosomes.get(chrom[len('chr'):])
+        if span is None:
+            return 0, 0
+
+        first, last = span
+        positions = self.arrays['pos'][first:last]
+        if start is not None:
+            first = span[0] + int(np.searchsorted(positions, start, side='left'))
+        if end is not None:
+            last = span[0] + int(np.searchsorted(positions, end, side='right'))
+        return first, max(first, last)
+
+
+def _column_dtype(column, labels):
+    return np.dtype('<u4' if column in labels else '<i8')
+
+
+def read_index(path):
+    with CountIndex(path) as count_index:
+        return count_index.to_dataframe()
@@ -0,0 +1,57 @@
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from core.utils.aggregation import CountAggregator, buffer_contribution
+
+DEFAULT_PREFETCH_THREADS = 8
+READ_AHEAD_PER_THREAD = 2
+
+
+def read_bytes(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def prefetch_files(records, threads=DEFAULT_PREFETCH_THREADS, depth=None, reader=read_bytes):
+    """Yields (record, data, wait_seconds) in input order while later files are read on a pool of threads
+
+    At most depth reads (default READ_AHEAD_PER_THREAD per thread) are outstanding or waiting to be consumed,
+    so memory is bounded by depth file buffers however many records there are. wait_seconds is how long the
+    consumer was blocked on that file's read.
+    """
+    depth = max(depth or threads * READ_AHEAD_PER_THREAD, 1)
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        try:
+            for record in records:
+                if len(pending) >= depth:
+                    yield _next_buffer(pending)
+                pending.append((record, executor.submit(reader, record.path)))
+            while pending:
+                yield _next_buffer(pending)
+        finally:
+            for _, future in pending:
+                future.cancel()
+
+
+def fold_prefetched_files(records, group_criteria=None, threads=DEFAULT_PREFETCH_THREADS, depth=None,
+                          profiler=None):
+    """Folds mutation files into a CountAggregator, parsing each buffer while the following files are read"""
+    aggregator = CountAggregator(group_criteria)
+    for record, data, wait_seconds in prefetch_files(records, threads, depth):
+        aggregator.add_mutation_buffer(record, data, profiler, wait_seconds)
+
+    return aggregator
+
+
+def prefetched_contributions(records, threads=DEFAULT_PREFETCH_THREADS, depth=None, profiler=None):
+    return [buffer_contribution(record, data, profiler, wait_seconds)
+            for record, data, wait_seconds in prefetch_files(records, threads, depth)]
+
+
+def _next_buffer(pending):
+    record, future = pending.popleft()
+    start = time.perf_counter()
+    data = future.result()
+    return record, data, time.perf_counter() - start
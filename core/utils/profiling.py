@@ -0,0 +1,137 @@
+import heapq
+import json
+import time
+from collections import OrderedDict
+
+
+class StageMetrics:
+
+    __slots__ = ('seconds', 'files', 'rows_read', 'barcode_rows', 'bytes_read')
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.files = 0
+        self.rows_read = 0
+        self.barcode_rows = 0
+        self.bytes_read = 0
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in self.__slots__}
+
+
+class _Stage:
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.metrics = profiler.metrics(name)
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self.metrics
+
+    def __exit__(self, *exc_info):
+        self.metrics.seconds += time.perf_counter() - self.start
+        if self.profiler.on_stage is not None:
+            self.profiler.on_stage(self.name, self.metrics)
+        return False
+
+
+file_stages = ('reading', 'splitting')
+
+
+class PipelineProfiler:
+    """Collects wall time and file/row/byte counts per pipeline stage, plus the slowest individual files
+
+    on_stage(name, metrics) is called as each stage finishes and on_file(record, seconds) after each file
+    is parsed. Per-file reading and splitting times are summed into the 'reading' and 'splitting' stages.
+    """
+
+    enabled = True
+
+    def __init__(self, n_slowest=10, on_stage=None, on_file=None):
+        self.n_slowest = n_slowest
+        self.on_stage = on_stage
+        self.on_file = on_file
+        self.stages = OrderedDict()
+        self._slowest = []
+
+    def metrics(self, name):
+        if name not in self.stages:
+            self.stages[name] = StageMetrics()
+        return self.stages[name]
+
+    def stage(self, name):
+        return _Stage(self, name)
+
+    def file_parsed(self, record, read_seconds, split_seconds=0.0, rows_read=0, barcode_rows=0):
+        reading = self.metrics('reading')
+        reading.seconds += read_seconds
+        reading.files += 1
+        reading.rows_read += rows_read
+        reading.barcode_rows += barcode_rows
+        reading.bytes_read += max(record.size, 0)
+        if split_seconds:
+            splitting = self.metrics('splitting')
+            splitting.seconds += split_seconds
+            splitting.files += 1
+            splitting.rows_read += rows_read - barcode_rows
+
+        seconds = read_seconds + split_seconds
+        entry = (seconds, record.path)
+        if len(self._slowest) < self.n_slowest:
+            heapq.heappush(self._slowest, entry)
+        elif entry > self._slowest[0]:
+            heapq.heapreplace(self._slowest, entry)
+        if self.on_file is not None:
+            self.on_file(record, seconds)
+
+    @property
+    def slowest_files(self):
+        return sorted(self._slowest, reverse=True)
+
+    def to_dict(self):
+        return {
+            'stages': OrderedDict((name, metrics.to_dict()) for name, metrics in self.stages.items()),
+            'slowest_files': [{'path': path, 'seconds': seconds} for seconds, path in self.slowest_files]
+        }
+
+    def save_json(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def summary(self):
+        lines = ['{:<12} {:>10} {:>8} {:>10} {:>10} {:>12}'.format(
+            'stage', 'seconds', 'files', 'rows', 'BARCODE', 'bytes')]
+        for name, metrics in self.stages.items():
+            label = '  ' + name if name in file_stages else name
+            lines.append('{:<12} {:>10.3f} {:>8} {:>10} {:>10} {:>12}'.format(
+                label, metrics.seconds, metrics.files, metrics.rows_read, metrics.barcode_rows, metrics.bytes_read))
+        if self._slowest:
+            lines.append('slowest files:')
+            lines.extend('{:>10.4f}s  {}'.format(seconds, path) for seconds, path in self.slowest_files)
+        return '\n'.join(lines)
+
+
+class _NullStage:
+
+    def __enter__(self):
+        return StageMetrics()
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+class NullProfiler:
+    """Stands in for PipelineProfiler when profiling is off; per-file hooks are skipped by checking enabled"""
+
+    enabled = False
+
+    def stage(self, name):
+        return _NullStage()
+
+    def file_parsed(self, *args, **kwargs):
+        pass
+
+
+NULL_PROFILER = NullProfiler()
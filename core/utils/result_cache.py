@@ -0,0 +1,76 @@
+import json
+import os
+
+DEFAULT_CACHE_DIR = '.tp53cache'
+
+
+class ResultCache:
+    """On-disk store of each mutation file's parsed contribution, keyed by path, mtime and size
+
+    A stored contribution is only returned while the file's mtime and size still match the record
+    it was stored with, so new or rewritten files are always re-parsed.
+    """
+
+    version = 1
+    index_name = 'contributions.json'
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self.index_path = os.path.join(cache_dir, self.index_name)
+        self.hits = 0
+        self.misses = 0
+        self.seen = set()
+        self.entries = self._load()
+
+    def _load(self):
+        if not os.path.exists(self.index_path):
+            return {}
+        with open(self.index_path) as f:
+            stored = json.load(f)
+        if stored.get('version') != self.version:
+            return {}
+        return stored['entries']
+
+    @staticmethod
+    def _key(record):
+        return os.path.abspath(record.path)
+
+    def get(self, record):
+        """Returns the cached contribution for record, or None (counted as a miss) if it is absent or stale"""
+        key = self._key(record)
+        self.seen.add(key)
+        entry = self.entries.get(key)
+        if entry is None or entry['mtime'] != record.mtime or entry['size'] != record.size:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return [(tuple(key), count) for key, count in entry['contribution']]
+
+    def put(self, record, contribution):
+        self.entries[self._key(record)] = {
+            'mtime': record.mtime,
+            'size': record.size,
+            'contribution': [[list(key), count] for key, count in contribution]
+        }
+
+    def invalidate(self):
+        self.entries = {}
+
+    def prune(self, records=None):
+        """Drops entries for files not among records (by default, not looked up this run) and returns how many"""
+        wanted = self.seen if records is None else set(self._key(record) for record in records)
+        stale = [path for path in self.entries if path not in wanted]
+        for path in stale:
+            del self.entries[path]
+        return len(stale)
+
+    def save(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        temp_path = self.index_path + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump({'version': self.version, 'entries': self.entries}, f)
+        os.replace(temp_path, self.index_path)
+
+    def __len__(self):
+        return len(self.entries)
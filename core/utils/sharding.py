@@ -0,0 +1,29 @@
+import re
+import zlib
+
+shard_regex = re.compile(r'(\d+)/(\d+)')
+
+
+def parse_shard(spec):
+    """Parses 'i/N' into (i, N), where shards are numbered 0 to N - 1"""
+    match = shard_regex.fullmatch(spec.strip())
+    if match is None:
+        raise ValueError('cannot parse shard {!r}, expected i/N'.format(spec))
+    index, n_shards = int(match.group(1)), int(match.group(2))
+    if not 0 <= index < n_shards:
+        raise ValueError('shard index must be between 0 and {} for {} shards'.format(n_shards - 1, n_shards))
+    return index, n_shards
+
+
+def shard_of(sample_dir_name, n_shards):
+    """Assigns a vcfs_<timepoint>_<sample> directory name to a shard, the same way on every host and run"""
+    return zlib.crc32(sample_dir_name.encode()) % n_shards
+
+
+def in_shard(sample_dir_name, shard):
+    index, n_shards = shard
+    return shard_of(sample_dir_name, n_shards) == index
+
+
+def record_in_shard(record, shard):
+    return in_shard('vcfs_{}_{}'.format(record.timepoint, record.sample_letter), shard)
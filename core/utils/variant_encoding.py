@@ -0,0 +1,174 @@
+"""Packs variants into single integer keys so counts can be aggregated on integer arrays
+
+A variant key is ``chr << 36 | pos << 4 | ref << 2 | alt``: chr is a small code from a label table, pos
+is the integer position and ref/alt are 2-bit codes for A, C, G and T. Each grouping column after the
+variant (sample, oligo, mutation) is mapped to a 6-bit code and shifted in below the variant key, so
+a whole output row is one int64 and aggregation is a sort plus np.add.reduceat over integer arrays.
+Labels are only decoded, and rows only put into output order, once at the end.
+"""
+import numpy as np
+import pandas as pd
+
+BASES = ('A', 'C', 'G', 'T')
+CHROMOSOME_BITS = 8
+POSITION_BITS = 32
+GROUP_BITS = 6
+VARIANT_BITS = CHROMOSOME_BITS + POSITION_BITS + 4
+variant_columns = ['chr', 'pos', 'ref', 'alt']
+
+
+class NotEncodableError(ValueError):
+    """Raised for rows that cannot be packed, e.g. indels, missing values or too many distinct labels"""
+
+
+class EncodedCounts:
+    """Running count totals held as sorted (int64 key, int64 count) arrays"""
+
+    def __init__(self, grouping):
+        if grouping[:4] != variant_columns:
+            raise NotEncodableError('grouping must start with {}'.format(variant_columns))
+        self.grouping = list(grouping)
+        self.group_columns = self.grouping[4:]
+        if VARIANT_BITS + GROUP_BITS * len(self.group_columns) > 63:
+            raise NotEncodableError('too many grouping columns to pack into one int64')
+
+        self.tables = {column: {} for column in ['chr'] + self.group_columns}
+        self.keys = np.empty(0, dtype=np.int64)
+        self.counts = np.empty(0, dtype=np.int64)
+        self.dtypes = None
+        self.position_widths = set()
+
+    def __len__(self):
+        return self.keys.size
+
+    def add(self, df):
+        """Folds a dataframe's rows into the totals; on NotEncodableError the totals are left unchanged"""
+        if df.empty:
+            return self
+
+        keys = self._label_codes('chr', df['chr'], 2 ** CHROMOSOME_BITS) << (POSITION_BITS + 4)
+        keys |= self._positions(df['pos']) << 4
+        keys |= _base_codes(df['ref']) << 2
+        keys |= _base_codes(df['alt'])
+        for column in self.group_columns:
+            keys = (keys << GROUP_BITS) | self._label_codes(column, df[column], 2 ** GROUP_BITS)
+
+        if self.dtypes is None:
+            self.dtypes = {column: _plain_dtype(df[column].dtype) for column in self.grouping + ['count']}
+        self.keys, self.counts = _sum_by_key(np.concatenate((self.keys, keys)),
+                                             np.concatenate((self.counts, df['count'].to_numpy(dtype=np.int64))))
+        return self
+
+    def to_dataframe(self):
+        """Decodes the totals into the columns, dtypes and row order of a pandas groupby-sum"""
+        if not len(self):
+            return pd.DataFrame(columns=self.grouping + ['count'])
+
+        columns = {}
+        group_ranks = np.zeros_like(self.keys)
+        remaining = self.keys
+        for shift, column in enumerate(reversed(self.group_columns)):
+            codes = remaining & (2 ** GROUP_BITS - 1)
+            labels, ranks = self._labels_and_ranks(column)
+            columns[column] = labels[codes]
+            group_ranks |= ranks[codes] << (GROUP_BITS * shift)
+            remaining = remaining >> GROUP_BITS
+
+        chr_labels, chr_ranks = self._labels_and_ranks('chr')
+        chr_codes = remaining >> (POSITION_BITS + 4)
+        positions = (remaining >> 4) & (2 ** POSITION_BITS - 1)
+        bases = np.array(BASES, dtype=object)
+        columns.update({
+            'chr': chr_labels[chr_codes],
+            'pos': positions if self._integer_positions() else _positions_to_strings(positions),
+            'ref': bases[(remaining >> 2) & 3],
+            'alt': bases[remaining & 3]
+        })
+
+        df = pd.DataFrame({column: pd.Series(columns[column]).astype(self.dtypes[column])
+                           for column in self.grouping})
+        df['count'] = self.counts.astype(self.dtypes['count'])
+
+        if self._integer_positions() or len(self.position_widths) == 1:
+            # integer order of pos matches its string order, so rank codes give the groupby order directly
+            variant_ranks = (chr_ranks[chr_codes] << (POSITION_BITS + 4)) | (remaining & (2 ** (POSITION_BITS + 4) - 1))
+            order = np.argsort((variant_ranks << (GROUP_BITS * len(self.group_columns))) | group_ranks)
+            return df.iloc[order].reset_index(drop=True)
+
+        return df.sort_values(self.grouping, kind='mergesort').reset_index(drop=True)
+
+    def _label_codes(self, column, values, limit):
+        codes, labels = _factorize(values)
+        table = self.tables[column]
+        for label in labels:
+            table.setdefault(label, len(table))
+        if len(table) > limit:
+            raise NotEncodableError('more than {} distinct {} values'.format(limit, column))
+        return np.array([table[label] for label in labels], dtype=np.int64)[codes]
+
+    def _labels_and_ranks(self, column):
+        labels = np.array(list(self.tables[column]), dtype=object)
+        ranks = np.empty(labels.size, dtype=np.int64)
+        ranks[sorted(range(labels.size), key=labels.__getitem__)] = np.arange(labels.size)
+        return labels, ranks
+
+    def _positions(self, positions):
+        if pd.api.types.is_integer_dtype(positions.dtype):
+            pos = positions.to_numpy(dtype=np.int64)
+        else:
+            codes, labels = _factorize(positions)
+            labels = pd.Series(labels).astype(str)
+            if not labels.str.fullmatch(r'[1-9]\d{0,9}|0').all():
+                raise NotEncodableError('positions must be plain decimal integers')
+            self.position_widths.update(labels.str.len().unique())
+            pos = labels.to_numpy().astype(np.int64)[codes]
+
+        if pos.min() < 0 or pos.max() >= 2 ** POSITION_BITS:
+            raise NotEncodableError('positions must fit in {} bits'.format(POSITION_BITS))
+        return pos
+
+    def _integer_positions(self):
+        return pd.api.types.is_integer_dtype(self.dtypes['pos'])
+
+
+def aggregate_encoded(df, grouping):
+    """Sums df['count'] per grouping on integer keys; same result and row order as a pandas groupby-sum
+
+    Raises NotEncodableError if the rows cannot be packed, so callers can fall back to pandas.
+    """
+    if df.empty:
+        raise NotEncodableError('nothing to encode')
+    return EncodedCounts(grouping).add(df).to_dataframe()
+
+
+def _plain_dtype(dtype):
+    """Categorical columns are decoded to their categories' dtype, since later batches may add categories"""
+    if isinstance(dtype, pd.CategoricalDtype):
+        return dtype.categories.dtype
+    return dtype
+
+
+def _factorize(values):
+    codes, labels = pd.factorize(values)
+    if (codes < 0).any():
+        raise NotEncodableError('missing values cannot be encoded')
+    return codes, labels
+
+
+def _base_codes(bases):
+    codes, labels = _factorize(bases)
+    if not set(labels) <= set(BASES):
+        raise NotEncodableError('only single-base A/C/G/T substitutions can be encoded')
+    return np.array([BASES.index(label) for label in labels], dtype=np.int64)[codes]
+
+
+def _sum_by_key(keys, counts):
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    starts = np.flatnonzero(np.concatenate(([True], sorted_keys[1:] != sorted_keys[:-1])))
+    return sorted_keys[starts], np.add.reduceat(counts[order], starts)
+
+
+def _positions_to_strings(positions):
+    unique_positions, inverse = np.unique(positions, return_inverse=True)
+    return unique_positions.astype(str).astype(object)[inverse.ravel()]
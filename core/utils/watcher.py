@@ -0,0 +1,162 @@
+import os
+import sys
+import time
+
+from core.utils.aggregation import CountAggregator, file_contribution
+from core.utils.directory_parsers import TopLevelDirectory
+from core.utils.manifest import MutationFileRecord
+
+RACY_SECONDS = 2.0
+
+
+class TreeWatcher:
+    """Finds mutation files added, changed or removed since the previous poll without re-listing the whole tree
+
+    Each directory's mtime is kept with its filtered listing, and a directory is only listed again once its
+    mtime moves, which happens whenever an entry is added or removed. A poll therefore costs one stat per
+    directory plus listing and stat calls for the directories that changed, however many files are unchanged.
+    A directory modified within RACY_SECONDS of being listed is listed again on the next poll, so files landing
+    within the mtime granularity of the filesystem are not missed. Files rewritten in place without any
+    directory change are only noticed by a full poll, or by the next poll after retry() was called for them.
+    """
+
+    levels = (
+        TopLevelDirectory.first_level_regex,
+        TopLevelDirectory.second_level_regex,
+        TopLevelDirectory.third_level_regex,
+        None
+    )
+
+    def __init__(self, path):
+        self.path = path
+        self.listings = 0
+        self._dirs = {}
+        self._files = {}
+
+    def poll(self, full=False):
+        """Returns (new or changed MutationFileRecords, paths of removed files) since the previous poll"""
+        self.listings = 0
+        now = time.time()
+        seen_dirs = {self.path}
+        changed_records = []
+        removed_paths = []
+
+        for mutation_dir in self._mutation_dirs(self.path, 0, now, seen_dirs):
+            try:
+                if not (self._changed(mutation_dir, now) or full) and mutation_dir in self._files:
+                    continue
+                paths = self._list(mutation_dir, TopLevelDirectory.mutation_file_regex, want_dirs=False)
+            except FileNotFoundError:
+                seen_dirs.discard(mutation_dir)
+                continue
+            known = self._files.get(mutation_dir, {})
+            listed = {}
+            for path in paths:
+                try:
+                    stat_result = os.stat(path)
+                except OSError as error:
+                    print('watch: skipping {} until the next poll: {}'.format(path, error), file=sys.stderr)
+                    self._relist(mutation_dir)
+                    continue
+                record = MutationFileRecord.from_path(path, stat_result.st_size, stat_result.st_mtime_ns)
+                listed[path] = (record.mtime, record.size)
+                if known.get(path) != listed[path]:
+                    changed_records.append(record)
+            removed_paths.extend(path for path in known if path not in listed)
+            self._files[mutation_dir] = listed
+
+        for mutation_dir in [path for path in self._files if path not in seen_dirs]:
+            removed_paths.extend(self._files.pop(mutation_dir))
+        for path in [path for path in self._dirs if path not in seen_dirs]:
+            del self._dirs[path]
+
+        return changed_records, removed_paths
+
+    def retry(self, path):
+        """Forgets a file that could not be read, so that the next poll reports it as new again"""
+        mutation_dir = os.path.dirname(path)
+        self._files.get(mutation_dir, {}).pop(path, None)
+        self._relist(mutation_dir)
+
+    def _relist(self, path):
+        if path in self._dirs:
+            self._dirs[path] = (None, self._dirs[path][1])
+
+    def _mutation_dirs(self, path, level, now, seen_dirs):
+        """Yields every DELETERIOUS/NON-DELETERIOUS directory, re-listing only the parents whose mtime moved
+
+        A directory removed since its parent was listed is left out of seen_dirs, so its files count as removed.
+        """
+        cached = self._dirs.get(path)
+        try:
+            if self._changed(path, now) or cached is None:
+                if level < len(self.levels) - 1:
+                    subdirs = self._list(path, self.levels[level])
+                else:
+                    subdirs = [os.path.join(path, mutation) for mutation in TopLevelDirectory.mutation_types
+                               if os.path.isdir(os.path.join(path, mutation))]
+            else:
+                subdirs = cached[1]
+        except FileNotFoundError:
+            seen_dirs.discard(path)
+            return
+        self._dirs[path] = (self._dirs[path][0], subdirs)
+
+        for subdir in subdirs:
+            seen_dirs.add(subdir)
+            if level < len(self.levels) - 1:
+                yield from self._mutation_dirs(subdir, level + 1, now, seen_dirs)
+            else:
+                yield subdir
+
+    def _changed(self, path, now):
+        """Stats path and records its mtime; a directory touched within RACY_SECONDS of now counts as changed"""
+        mtime = os.stat(path).st_mtime
+        cached = self._dirs.get(path)
+        self._dirs[path] = (mtime if now - mtime > RACY_SECONDS else None, cached[1] if cached else None)
+        return cached is None or cached[0] is None or cached[0] != mtime
+
+    def _list(self, path, regex=None, want_dirs=True):
+        self.listings += 1
+        with os.scandir(path) as entries:
+            return sorted(entry.path for entry in entries
+                          if (regex is None or regex.fullmatch(entry.name))
+                          and (entry.is_dir() if want_dirs else entry.is_file()))
+
+
+class IncrementalCounts:
+    """Running totals for several groupings that are updated with only the files changed since the last update
+
+    Each file's contribution is kept so that a changed or removed file can be taken back out of the totals.
+    A file that cannot be read, such as one still being written, is left out and tried again on the next update.
+    """
+
+    def __init__(self, dir_name, groupings=(None,)):
+        self.watcher = TreeWatcher(dir_name)
+        self.aggregators = [CountAggregator(grouping) for grouping in groupings]
+        self.contributions = {}
+
+    def update(self, full=False):
+        """Applies the changes found by one poll of the tree and returns (changed files, removed files)"""
+        changed_records, removed_paths = self.watcher.poll(full)
+        for path in removed_paths + [record.path for record in changed_records]:
+            contribution = self.contributions.pop(path, None)
+            if contribution is not None:
+                for aggregator in self.aggregators:
+                    aggregator.remove_contribution(contribution)
+
+        for record in changed_records:
+            try:
+                contribution = file_contribution(record)
+            except (OSError, ValueError) as error:
+                print('watch: skipping {} until the next poll: {}'.format(record.path, error), file=sys.stderr)
+                self.watcher.retry(record.path)
+                continue
+            self.contributions[record.path] = contribution
+            for aggregator in self.aggregators:
+                aggregator.add_contribution(contribution)
+
+        return len(changed_records), len(removed_paths)
+
+    def to_dataframes(self):
+        return [aggregator.to_dataframe() for aggregator in self.aggregators]
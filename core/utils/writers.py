@@ -0,0 +1,78 @@
+import os
+
+import pandas as pd
+
+from core.utils.output_formats import OUTPUT_FORMATS, infer_format
+from core.utils.position_index import read_index, write_index
+
+categorical_columns = ('chr', 'ref', 'alt', 'sample', 'oligo', 'mutation')
+integer_columns = ('pos', 'count')
+
+
+def compact_counts(df):
+    """Returns a copy of df with categorical label columns and integer pos/count columns"""
+    df = df.copy()
+    for column in df.columns:
+        if column in categorical_columns:
+            df[column] = df[column].astype('category')
+        elif column in integer_columns:
+            df[column] = pd.to_numeric(df[column]).astype('int64')
+    return df
+
+
+def write_counts(df, path, output_format=None):
+    """Writes merged counts as tsv, gzip-compressed tsv, parquet, feather or a position index (tp53idx)"""
+    output_format = output_format or infer_format(path)
+    if output_format == 'tsv':
+        with open(path, 'w') as f:
+            df.to_csv(f, sep='\t', index=False)
+    elif output_format == 'tsv.gz':
+        df.to_csv(path, sep='\t', index=False, compression={'method': 'gzip', 'mtime': 0})
+    elif output_format in ('parquet', 'feather'):
+        _require_pyarrow(output_format)
+        compact_df = compact_counts(df).reset_index(drop=True)
+        if output_format == 'parquet':
+            compact_df.to_parquet(path, index=False)
+        else:
+            compact_df.to_feather(path)
+    elif output_format == 'tp53idx':
+        write_index(df, path)
+    else:
+        raise ValueError('unknown output format {!r}, expected one of {}'.format(output_format, OUTPUT_FORMATS))
+
+
+def replace_counts(df, path, output_format=None):
+    """Same as write_counts, but readers of path only ever see the previous or the new file, never a partial one"""
+    output_format = output_format or infer_format(path)
+    directory, file_name = os.path.split(path)
+    temp_path = os.path.join(directory, '.{}.tmp'.format(file_name))
+    write_counts(df, temp_path, output_format)
+    os.replace(temp_path, path)
+
+
+def read_counts(path, output_format=None, as_strings=False):
+    """Reads a file written by write_counts back into a dataframe
+
+    With as_strings, every column but count comes back as str, as in a freshly merged dataframe.
+    """
+    output_format = output_format or infer_format(path)
+    if output_format in ('tsv', 'tsv.gz'):
+        df = pd.read_csv(path, sep='\t', header=0, dtype=str if as_strings else None)
+    elif output_format in ('parquet', 'feather'):
+        _require_pyarrow(output_format)
+        df = pd.read_parquet(path) if output_format == 'parquet' else pd.read_feather(path)
+    elif output_format == 'tp53idx':
+        df = read_index(path)
+    else:
+        raise ValueError('unknown output format {!r}, expected one of {}'.format(output_format, OUTPUT_FORMATS))
+
+    if as_strings:
+        df = df.astype({column: str if column != 'count' else 'int64' for column in df.columns})
+    return df
+
+
+def _require_pyarrow(output_format):
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        raise ImportError('the {} format requires pyarrow (pip install pyarrow)'.format(output_format))
@@ -1,26 +1,433 @@
+"""Counts variants across a run tree of mut_id files
+
+Only light modules are imported at load time, so --help, argument errors and --dry-run return without loading
+pandas or numpy; the functions below import the parsing, aggregation and output modules when they first run.
+"""
 import argparse
+import os
+import sys
+import time
+from collections import Counter
 
 from core.utils.directory_parsers import TopLevelDirectory
-from core.utils.mutation_counters import convert_mutation_file_to_dataframe, merge_dataframes
+from core.utils.manifest import Manifest, MutationFileRecord
+from core.utils.output_formats import OUTPUT_FORMATS, infer_format
+from core.utils.profiling import NULL_PROFILER, PipelineProfiler
+from core.utils.result_cache import DEFAULT_CACHE_DIR, ResultCache
+from core.utils.sharding import parse_shard, record_in_shard
 
+CHUNKS_PER_JOB = 4
+UNGROUPED = 'full'
+DEFAULT_WATCH_INTERVAL = 10.0
+FULL_SCAN_EVERY = 30
 
-def generate_merged_df(dir_name, grouping):
-    top_level_directory = TopLevelDirectory(dir_name)
-    merged_df = merge_dataframes([convert_mutation_file_to_dataframe(mut_file) for mut_file in
-                                  top_level_directory.mutation_files], grouping)
 
-    return merged_df
+def load_manifest(dir_name, manifest_path=None, shard=None):
+    """Reuses a saved manifest when one exists at manifest_path, otherwise walks dir_name (and saves it)
 
+    A saved manifest must only list files under dir_name, so that it is not reused for a different tree.
 
-if __name__ == '__main__':
+    Given shard=(i, N), only the files of the vcfs_<timepoint>_<sample> directories in shard i are kept.
+    """
+    if manifest_path and os.path.exists(manifest_path):
+        manifest = Manifest.load(manifest_path)
+        root = os.path.abspath(dir_name)
+        if any(os.path.commonpath([root, os.path.abspath(path)]) != root for path in manifest.paths):
+            raise ValueError('the manifest {} lists files outside {}; remove it or pass the directory it was saved '
+                             'for'.format(manifest_path, dir_name))
+        if shard is None:
+            return manifest
+        return Manifest(record for record in manifest if record_in_shard(record, shard))
 
-    parser = argparse.ArgumentParser()
-    parser.add_argument('--directory', '-d', type=str, help='directory with file', required=True)
+    manifest = TopLevelDirectory(dir_name, shard).manifest
+    if manifest_path:
+        manifest.save(manifest_path)
+
+    return manifest
+
+
+def split_into_chunks(records, n_chunks):
+    """Splits records into at most n_chunks contiguous, non-empty chunks"""
+    chunk_size = -(-len(records) // max(n_chunks, 1))
+    return [records[start:start + chunk_size] for start in range(0, len(records), max(chunk_size, 1))]
+
+
+def fold_with_cache(manifest, grouping, cache, jobs=1, prefetch=0, profiler=NULL_PROFILER):
+    """Parses only the files missing from (or stale in) the cache and folds them in with the cached contributions
+
+    Returns the CountAggregator and the records that had to be parsed.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    from core.utils.aggregation import CountAggregator, file_contribution, file_contributions
+    from core.utils.prefetch import prefetched_contributions
+
+    aggregator = CountAggregator(grouping)
+    misses = []
+    for record in manifest:
+        contribution = cache.get(record)
+        if contribution is None:
+            misses.append(record)
+        else:
+            aggregator.add_contribution(contribution)
+
+    if jobs > 1 and misses:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            chunks = split_into_chunks(misses, jobs * CHUNKS_PER_JOB)
+            contributions = [contribution for chunk_contributions in executor.map(file_contributions, chunks)
+                             for contribution in chunk_contributions]
+    elif prefetch > 0:
+        contributions = prefetched_contributions(misses, prefetch, profiler=profiler if profiler.enabled else None)
+    else:
+        contributions = [file_contribution(record, profiler if profiler.enabled else None) for record in misses]
+
+    for record, contribution in zip(misses, contributions):
+        cache.put(record, contribution)
+        aggregator.add_contribution(contribution)
+
+    return aggregator, misses
+
+
+def generate_merged_df(dir_name, grouping, manifest_path=None, jobs=1, streaming=False, cache=None, prefetch=0,
+                       shard=None, profiler=NULL_PROFILER):
+    """With streaming, each parsed file is folded into a running total and dropped before the next is read
+
+    Given a ResultCache, only new or changed files are parsed; the caller is responsible for saving the cache.
+    A cache needs the tree walked and stat'ed this run, so it cannot be combined with a saved manifest_path.
+    With prefetch > 0, that many threads read files ahead of the parser (ignored when jobs > 1).
+    Stage timings go to profiler; per-file timings are only collected when parsing in this process.
+    Given shard=(i, N), only shard i of the tree is counted (see core.utils.sharding).
+    dir_name may also be an archive written by the pack command, which is aggregated straight from its memory map.
+    """
+    if cache is not None and manifest_path:
+        raise ValueError('a result cache cannot be combined with a saved manifest, whose sizes and mtimes may be stale')
+
+    from concurrent.futures import ProcessPoolExecutor
+    from functools import partial
+
+    from core.utils.aggregation import (CountAggregator, aggregate_mutation_files, aggregate_stream,
+                                        fold_mutation_files)
+    from core.utils.archive import PackedRun, is_archive
+    from core.utils.mutation_counters import convert_mutation_file_to_dataframe, merge_dataframes
+    from core.utils.prefetch import fold_prefetched_files
+
+    if is_archive(dir_name):
+        with profiler.stage('merging') as metrics, PackedRun(dir_name) as packed_run:
+            metrics.files = len(packed_run)
+            metrics.rows_read = packed_run.records.size
+            return packed_run.aggregate(grouping)
+
+    with profiler.stage('discovery') as metrics:
+        manifest = load_manifest(dir_name, manifest_path, shard)
+        metrics.files = len(manifest)
+
+    file_profiler = profiler if profiler.enabled else None
+    with profiler.stage('parsing') as metrics:
+        parsed_records = manifest.records
+        if cache is not None:
+            parsed, parsed_records = fold_with_cache(manifest, grouping, cache, jobs, prefetch, profiler)
+        elif jobs > 1:
+            chunks = split_into_chunks(manifest.records, jobs * CHUNKS_PER_JOB)
+            with ProcessPoolExecutor(max_workers=jobs) as executor:
+                parsed = list(executor.map(partial(aggregate_mutation_files, group_criteria=grouping), chunks))
+        elif prefetch > 0:
+            parsed = fold_prefetched_files(manifest, grouping, prefetch, profiler=file_profiler)
+        elif streaming:
+            parsed = fold_mutation_files(manifest, grouping, file_profiler)
+        else:
+            parsed = [convert_mutation_file_to_dataframe(record, file_profiler) for record in manifest]
+
+        metrics.files = len(parsed_records)
+        if profiler.enabled:
+            metrics.bytes_read = sum(max(record.size, 0) for record in parsed_records)
+
+    with profiler.stage('merging'):
+        if isinstance(parsed, CountAggregator):
+            return parsed.to_dataframe()
+        merge = aggregate_stream if streaming else merge_dataframes
+        return merge(parsed, grouping)
+
+
+def generate_grouped_dfs(dir_name, groupings, **kwargs):
+    """Parses and aggregates the tree once at the finest grain, then rolls it up to each grouping in turn"""
+    from core.utils.mutation_counters import roll_up
+
+    merged_df = generate_merged_df(dir_name, None, **kwargs)
+    with kwargs.get('profiler', NULL_PROFILER).stage('rolling_up'):
+        return [roll_up(merged_df, grouping) for grouping in groupings]
+
+
+def reduce_partials(partial_paths, groupings=(None,)):
+    """Sums the ungrouped partial counts written by --shard runs and rolls the total up to each grouping"""
+    from core.utils.mutation_counters import get_grouping_columns, merge_dataframes, roll_up
+    from core.utils.writers import read_counts
+
+    partials = []
+    for path in partial_paths:
+        partial = read_counts(path, as_strings=True)
+        if list(partial.columns) != get_grouping_columns() + ['count']:
+            raise ValueError('{} is not an ungrouped partial count file'.format(path))
+        if not partial.empty:
+            partials.append(partial)
+
+    merged_df = merge_dataframes(partials)
+    return [roll_up(merged_df, grouping) for grouping in groupings]
+
+
+def grouping_output_paths(output, groupings, output_format=None):
+    """The output file for each grouping: output itself for a single grouping, otherwise one name per grouping"""
+    if len(groupings) == 1:
+        return [output]
+    return [grouping_output_path(output, grouping, output_format) for grouping in groupings]
+
+
+def grouping_output_path(output, grouping, output_format=None):
+    """Inserts the grouping name before the extension, e.g. counts.tsv -> counts.oligo.tsv"""
+    extension = '.' + (output_format or infer_format(output))
+    stem, extension = (output[:-len(extension)], extension) if output.endswith(extension) else (output, '')
+    return '{}.{}{}'.format(stem, '_'.join(grouping) if grouping else UNGROUPED, extension)
+
+
+def parse_groupings(groupby_args):
+    """Turns repeated --groupby options into grouping lists, with 'full' (or no option) meaning ungrouped"""
+    if not groupby_args:
+        return [None]
+    groupings = []
+    for criteria in groupby_args:
+        if UNGROUPED in criteria and len(criteria) > 1:
+            raise ValueError('{!r} cannot be combined with other criteria'.format(UNGROUPED))
+        groupings.append(None if criteria == [UNGROUPED] else criteria)
+    return groupings
+
+
+def watch(dir_name, groupings, output_paths, output_format=None, interval=DEFAULT_WATCH_INTERVAL,
+          full_scan_every=FULL_SCAN_EVERY, max_updates=None):
+    """Keeps the counts in memory, applying only new, changed or removed files and rewriting outputs atomically
+
+    Every full_scan_every-th poll also re-stats unchanged directories' files, to catch files rewritten in place.
+    Runs until interrupted, or for max_updates polls.
+    """
+    from core.utils.watcher import IncrementalCounts
+    from core.utils.writers import replace_counts
+
+    counts = IncrementalCounts(dir_name, groupings)
+    updates = 0
+    while max_updates is None or updates < max_updates:
+        if updates:
+            time.sleep(interval)
+        full = bool(full_scan_every) and updates % full_scan_every == 0
+        changed, removed = counts.update(full)
+        if changed or removed or not updates:
+            for df, output_path in zip(counts.to_dataframes(), output_paths):
+                replace_counts(df, output_path, output_format)
+            print('watch: {} new or changed, {} removed files; {} files counted'.format(
+                changed, removed, len(counts.contributions)), file=sys.stderr)
+        updates += 1
+
+    return counts
+
+
+def list_files(dir_name, out=None):
+    """Walks dir_name and prints the number of mutation files per timepoint, sample and oligo without reading them"""
+    out = out or sys.stdout
+    tally = Counter()
+    for path in TopLevelDirectory(dir_name).mutation_files:
+        record = MutationFileRecord.from_path(path)
+        tally[(record.timepoint, record.sample, record.oligo, record.mutation)] += 1
+
+    mutation_types = TopLevelDirectory.mutation_types
+    print('\t'.join(('timepoint', 'sample', 'oligo') + mutation_types + ('files',)), file=out)
+    for timepoint, sample, oligo in sorted(set(key[:3] for key in tally)):
+        class_counts = [tally[(timepoint, sample, oligo, mutation)] for mutation in mutation_types]
+        print('\t'.join([timepoint, sample, oligo] + [str(count) for count in class_counts + [sum(class_counts)]]),
+              file=out)
+    print('{} files'.format(sum(tally.values())), file=out)
+    return tally
+
+
+def pack_main(argv=None):
+    parser = argparse.ArgumentParser(prog='counts.py pack',
+                                     description='pack a run tree into a single archive that -d can read directly')
+    parser.add_argument('--directory', '-d', type=str, help='run tree to pack', required=True)
+    parser.add_argument('--output', '-o', type=str, required=True,
+                        help='archive file name, e.g. run.tp53pack')
+    args = parser.parse_args(argv)
+
+    from core.utils.archive import pack_directory
+
+    manifest = pack_directory(args.directory, args.output)
+    print('packed {} files into {}'.format(len(manifest), args.output), file=sys.stderr)
+
+
+def query_main(argv=None):
+    parser = argparse.ArgumentParser(prog='counts.py query',
+                                     description='print the counts in a genomic region from a tp53idx output')
+    parser.add_argument('index', type=str, help='counts written with --format tp53idx')
+    parser.add_argument('region', type=str, help='chr[:start[-end]], e.g. chr17:7578400-7578550 (inclusive)')
+    for column in ('sample', 'oligo', 'mutation'):
+        parser.add_argument('--' + column, type=str, help='only rows with this {}'.format(column))
+    args = parser.parse_args(argv)
+
+    from core.utils.position_index import CountIndex, parse_region
+    try:
+        chrom, start, end = parse_region(args.region)
+        with CountIndex(args.index) as count_index:
+            filters = {column: getattr(args, column) for column in ('sample', 'oligo', 'mutation')
+                       if getattr(args, column) is not None}
+            rows = count_index.query(chrom, start, end, **filters)
+            columns = count_index.columns
+    except ValueError as error:
+        parser.error(str(error))
+
+    print('\t'.join(columns))
+    for row in rows:
+        print('\t'.join(str(value) for value in row))
+
+
+def reduce_main(argv=None):
+    parser = argparse.ArgumentParser(prog='counts.py reduce',
+                                     description='combine the partial counts written by --shard runs')
+    parser.add_argument('partials', type=str, nargs='+', help='partial count files, one per shard')
     parser.add_argument('--output', '-o', type=str, help='output file name', required=True)
-    parser.add_argument('--groupby', type=str, nargs='+', choices=['oligo', 'sample', 'mutation'], help='criteria to group by')
-    args = parser.parse_args()
+    add_groupby_argument(parser)
+    parser.add_argument('--format', type=str, choices=OUTPUT_FORMATS, dest='output_format',
+                        help='output format (default: inferred from the output file extension, otherwise tsv)')
+    args = parser.parse_args(argv)
+
+    try:
+        groupings = parse_groupings(args.groupby)
+        dfs = reduce_partials(args.partials, groupings)
+    except ValueError as error:
+        parser.error(str(error))
+
+    from core.utils.writers import write_counts
+    for df, output_path in zip(dfs, grouping_output_paths(args.output, groupings, args.output_format)):
+        write_counts(df, output_path, args.output_format)
 
-    df = generate_merged_df(args.directory, args.groupby)
 
-    with open(args.output, 'w') as f:
-        df.to_csv(f, sep='\t', index=False)
+def add_groupby_argument(parser):
+    parser.add_argument('--groupby', type=str, nargs='+', action='append',
+                        choices=['oligo', 'sample', 'mutation', UNGROUPED],
+                        help="criteria to group by; repeat for several outputs from one scan ('{}' for ungrouped), "
+                             "each written to the output name with the grouping inserted before the "
+                             "extension".format(UNGROUPED))
+
+
+def counts_main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--directory', '-d', type=str, required=True,
+                        help='directory with file, or an archive written by the pack command')
+    parser.add_argument('--output', '-o', type=str, help='output file name (required unless --dry-run)')
+    parser.add_argument('--dry-run', '--list-files', action='store_true',
+                        help='only walk the directory and print how many files each timepoint, sample and oligo has')
+    add_groupby_argument(parser)
+    parser.add_argument('--manifest', type=str,
+                        help='file manifest to reuse if it exists, or to save after walking the directory')
+    parser.add_argument('--jobs', '-j', type=int, default=1, help='number of worker processes used to parse files')
+    parser.add_argument('--prefetch', type=int, default=0, metavar='THREADS',
+                        help='read files ahead of the parser on this many threads, which hides per-file latency '
+                             'on network storage (default: 0, read one file at a time)')
+    parser.add_argument('--streaming', action='store_true',
+                        help='fold each file into a running total so memory depends on distinct variants only')
+    parser.add_argument('--format', type=str, choices=OUTPUT_FORMATS, dest='output_format',
+                        help='output format (default: inferred from the output file extension, otherwise tsv)')
+    parser.add_argument('--cache', type=str, nargs='?', const=DEFAULT_CACHE_DIR,
+                        help='directory of cached per-file results, so that only new or changed files are parsed '
+                             '(default: {})'.format(DEFAULT_CACHE_DIR))
+    parser.add_argument('--invalidate-cache', action='store_true', help='discard every cached result before the run')
+    parser.add_argument('--prune-cache', action='store_true',
+                        help='drop cached results for files that are no longer in the directory')
+    parser.add_argument('--profile', action='store_true',
+                        help='print time, file, row and byte counts per stage and the slowest files to stderr')
+    parser.add_argument('--profile-json', type=str, help='also save the profile as JSON to this file')
+    parser.add_argument('--watch', type=float, nargs='?', const=DEFAULT_WATCH_INTERVAL, metavar='SECONDS',
+                        help='keep running, polling the directory every SECONDS (default: {:g}) and rewriting the '
+                             'output whenever mutation files are added, changed or removed'.format(
+                                 DEFAULT_WATCH_INTERVAL))
+    parser.add_argument('--shard', type=str, metavar='i/N',
+                        help='count only shard i (0 to N-1) of the vcfs_<timepoint>_<sample> directories and write '
+                             'ungrouped partial counts, to be combined with the reduce command')
+    args = parser.parse_args(argv)
+
+    if args.dry_run:
+        list_files(args.directory)
+        return
+    if args.output is None:
+        parser.error('the following arguments are required: --output/-o')
+
+    try:
+        groupings = parse_groupings(args.groupby)
+        shard = parse_shard(args.shard) if args.shard else None
+    except ValueError as error:
+        parser.error(str(error))
+    if shard is not None:
+        from core.utils.archive import is_archive
+        if args.watch is not None:
+            parser.error('--shard cannot be combined with --watch')
+        if args.groupby:
+            parser.error('--shard writes ungrouped partial counts; use --groupby with the reduce command instead')
+        if is_archive(args.directory):
+            parser.error('--shard needs a directory, not a packed archive')
+    for flag, given in (('--invalidate-cache', args.invalidate_cache), ('--prune-cache', args.prune_cache)):
+        if given and not args.cache:
+            parser.error('{} needs --cache'.format(flag))
+    output_paths = grouping_output_paths(args.output, groupings, args.output_format)
+
+    if args.watch is not None:
+        from core.utils.archive import is_archive
+        if is_archive(args.directory):
+            parser.error('--watch needs a directory, not a packed archive')
+        try:
+            watch(args.directory, groupings, output_paths, args.output_format, args.watch)
+        except KeyboardInterrupt:
+            pass
+        return
+
+    if args.cache and args.manifest:
+        parser.error('--cache checks every file on disk, so it cannot be combined with --manifest')
+    cache = ResultCache(args.cache) if args.cache else None
+    if cache is not None and args.invalidate_cache:
+        cache.invalidate()
+
+    profiler = PipelineProfiler() if args.profile or args.profile_json else NULL_PROFILER
+    run_options = dict(manifest_path=args.manifest, jobs=args.jobs, streaming=args.streaming, cache=cache,
+                       prefetch=args.prefetch, shard=shard, profiler=profiler)
+    try:
+        if len(groupings) == 1:
+            dfs = [generate_merged_df(args.directory, groupings[0], **run_options)]
+        else:
+            dfs = generate_grouped_dfs(args.directory, groupings, **run_options)
+    except ValueError as error:
+        parser.error(str(error))
+
+    if cache is not None:
+        if args.prune_cache:
+            pruned = cache.prune()
+            print('cache: pruned {} entries'.format(pruned), file=sys.stderr)
+        cache.save()
+        print('cache: {} hits, {} misses'.format(cache.hits, cache.misses), file=sys.stderr)
+
+    from core.utils.writers import write_counts
+    with profiler.stage('writing') as metrics:
+        for df, output_path in zip(dfs, output_paths):
+            write_counts(df, output_path, args.output_format)
+            metrics.files += 1
+
+    if profiler.enabled:
+        print(profiler.summary(), file=sys.stderr)
+        if args.profile_json:
+            profiler.save_json(args.profile_json)
+
+
+commands = {'pack': pack_main, 'query': query_main, 'reduce': reduce_main}
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] in commands:
+        return commands[argv[0]](argv[1:])
+    return counts_main(argv)
+
+
+if __name__ == '__main__':
+    main()
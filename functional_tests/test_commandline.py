@@ -1,5 +1,6 @@
 import os
 import shutil
+import sys
 import tempfile
 from unittest import TestCase
 
@@ -8,6 +9,7 @@ import pandas as pd
 temp_dir = tempfile.mkdtemp()
 test_dir = os.path.dirname(os.path.realpath(__file__))
 resource_dir = os.path.join(test_dir, '..', 'tests', 'resources')
+counts_script = os.path.join(test_dir, '..', 'counts.py')
 
 
 class MainRunTest(TestCase):
@@ -33,8 +35,8 @@ class MainRunTest(TestCase):
         # Erica supplies a directory on the command-line via the -d flag
         # Erica supplies a output file name via the -o flag
 
-        os.system('~/envs/py3.6/bin/python3 ~/Coding/tp53/counts.py -d {} -o {}'.format(
-                  temp_dir, os.path.join(temp_dir, 'output.tsv')))
+        os.system('{} {} -d {} -o {}'.format(
+                  sys.executable, counts_script, temp_dir, os.path.join(temp_dir, 'output.tsv')))
         self.assertTrue(os.path.exists(os.path.join(temp_dir, 'output.tsv')))
 
         rows = [
@@ -58,8 +60,8 @@ class MainRunTest(TestCase):
 
     def test_group_by_oligo_only(self):
 
-        os.system('~/envs/py3.6/bin/python3 ~/Coding/tp53/counts.py -d {} -o {} --groupby oligo'.format(
-            temp_dir, os.path.join(temp_dir, 'output.tsv')))
+        os.system('{} {} -d {} -o {} --groupby oligo'.format(
+            sys.executable, counts_script, temp_dir, os.path.join(temp_dir, 'output.tsv')))
         self.assertTrue(os.path.exists(os.path.join(temp_dir, 'output.tsv')))
 
         rows = [
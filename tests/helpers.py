@@ -0,0 +1,46 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from benchmarks.synthetic import header
+
+variants = ['17_7578424_A/C', '17_7578439_T/G', '17_7578507_G/T', '17_7578498_C/T', '17_7578519_C/A',
+            '7_140453136_A/T', 'X_153296777_G/A']
+
+
+def make_run_tree(root):
+    """Writes a small run tree with overlapping variants across samples, oligos and mutation classes"""
+    oligo_dirs = [
+        os.path.join('48hr_final', 'vcfs_48hr_C', 'vcfs_48hr_C_oligo3only'),
+        os.path.join('48hr_final', 'vcfs_48hr_C', 'vcfs_48hr_C_oligo2'),
+        os.path.join('12d_final2', 'vcfs_12d_B', 'vcfs_12d_B_oligo1T'),
+        os.path.join('12d_final2', 'vcfs_12d_C', 'vcfs_12d_C_oligo1T'),
+        os.path.join('12d_final2', 'vcfs_12d_C', 'vcfs_12d_C_oligo1G')
+    ]
+    file_number = 0
+    for oligo_index, oligo_dir in enumerate(oligo_dirs):
+        for mutation in ('DELETERIOUS', 'NON-DELETERIOUS'):
+            mutation_dir = os.path.join(root, oligo_dir, mutation)
+            os.makedirs(mutation_dir)
+            for mut_id in range(1, 6):
+                file_number += 1
+                file_path = os.path.join(mutation_dir, 'mut_id{}_{}.txt'.format(mut_id, file_number % 7 + 1))
+                with open(file_path, 'w') as f:
+                    f.write(header)
+                    f.write('{}\t-\t-\t-\t-\tBARCODE\n'.format(variants[(mut_id + 1) % len(variants)]))
+                    for variant_index in range(mut_id % 3 + 1):
+                        variant = variants[(variant_index + oligo_index + mut_id) % len(variants)]
+                        f.write('{}\t0.0\tdeleterious\t0.5\tpossibly_damaging\t{}\n'.format(variant, mutation))
+
+
+class RunTreeTestCase(TestCase):
+    """Builds make_run_tree under self.tree, inside a temporary directory that is removed after each test"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.tree = os.path.join(self.temp_dir, 'tree')
+        make_run_tree(self.tree)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
@@ -0,0 +1,37 @@
+from unittest import TestCase
+
+from pandas import DataFrame
+
+from core.utils.aggregation import CountAggregator, aggregate_stream
+from core.utils.mutation_counters import merge_dataframes
+
+headers = ['chr', 'pos', 'ref', 'alt', 'sample', 'oligo', 'mutation', 'count']
+rows = [
+    ['17', '7578439', 'T', 'G', '48hr_C', '1A', 'DELETERIOUS', 1],
+    ['17', '7578424', 'A', 'C', '48hr_C', '1A', 'DELETERIOUS', 4],
+    ['17', '7578439', 'T', 'G', '12d_B', '1A', 'DELETERIOUS', 2],
+    ['17', '7578424', 'A', 'C', '48hr_C', '2', 'NON-DELETERIOUS', 3],
+    ['17', '7578424', 'A', 'C', '48hr_C', '1A', 'DELETERIOUS', 5],
+]
+
+
+class AggregationTest(TestCase):
+
+    def test_stream_matches_merged_dataframes(self):
+        for grouping in (None, ['oligo'], ['sample']):
+            expected_df = merge_dataframes([DataFrame([row], columns=headers) for row in rows], grouping)
+            streamed_df = aggregate_stream((DataFrame([row], columns=headers) for row in rows), grouping)
+            self.assertEqual(expected_df.to_csv(sep='\t', index=False), streamed_df.to_csv(sep='\t', index=False))
+
+    def test_keeps_one_entry_per_group(self):
+        aggregator = CountAggregator(['oligo'])
+        for row in rows:
+            aggregator.add_dataframe(DataFrame([row], columns=headers))
+
+        self.assertEqual(3, len(aggregator))
+        self.assertEqual(9, aggregator.counts[('17', '7578424', 'A', 'C', '1A')])
+
+    def test_empty_stream_returns_empty_dataframe(self):
+        df = aggregate_stream([], ['oligo'])
+        self.assertEqual(['chr', 'pos', 'ref', 'alt', 'oligo', 'count'], list(df.columns))
+        self.assertEqual(0, df.shape[0])
@@ -0,0 +1,72 @@
+import os
+import subprocess
+import sys
+
+import pandas as pd
+
+from core.utils.archive import PackedRun, aggregate_archive, is_archive, pack_directory
+from core.utils.directory_parsers import TopLevelDirectory
+from counts import generate_merged_df
+from tests.helpers import RunTreeTestCase
+
+counts_script = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'counts.py')
+
+
+class PackedRunTest(RunTreeTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.archive_path = os.path.join(self.temp_dir, 'run.tp53pack')
+
+    def test_archive_matches_raw_tree(self):
+        pack_directory(self.tree, self.archive_path)
+        for grouping in (None, ['oligo'], ['sample'], ['mutation'], ['sample', 'oligo']):
+            expected_tsv = generate_merged_df(self.tree, grouping).to_csv(sep='\t', index=False)
+            for df in (aggregate_archive(self.archive_path, grouping), generate_merged_df(self.archive_path, grouping)):
+                self.assertEqual(expected_tsv, df.to_csv(sep='\t', index=False))
+
+    def test_header_keeps_path_metadata(self):
+        manifest = pack_directory(self.tree, self.archive_path)
+        with PackedRun(self.archive_path) as packed_run:
+            self.assertEqual(manifest.records, packed_run.manifest.records)
+            self.assertEqual(len(manifest), len(packed_run))
+
+    def test_records_are_views_of_the_memory_map(self):
+        pack_directory(self.tree, self.archive_path)
+        with PackedRun(self.archive_path) as packed_run:
+            self.assertFalse(packed_run.records.flags.owndata)
+            self.assertFalse(packed_run.records.flags.writeable)
+            self.assertGreater(packed_run.records.size, 0)
+
+    def test_closing_with_a_live_view_leaves_the_view_readable(self):
+        pack_directory(self.tree, self.archive_path)
+        with PackedRun(self.archive_path) as packed_run:
+            files = packed_run.records['file']
+        self.assertIsNone(packed_run.records)
+        self.assertEqual(len(packed_run) - 1, files.max())
+
+    def test_rejects_files_that_are_not_archives(self):
+        other_path = TopLevelDirectory(self.tree).mutation_files[0]
+        self.assertFalse(is_archive(other_path))
+        self.assertFalse(is_archive(self.tree))
+        with self.assertRaises(ValueError):
+            PackedRun(other_path)
+
+    def test_empty_tree_packs_to_empty_counts(self):
+        empty_tree = os.path.join(self.temp_dir, 'empty')
+        os.makedirs(empty_tree)
+        pack_directory(empty_tree, self.archive_path)
+
+        df = aggregate_archive(self.archive_path, ['oligo'])
+        self.assertEqual(['chr', 'pos', 'ref', 'alt', 'oligo', 'count'], list(df.columns))
+        self.assertEqual(0, df.shape[0])
+
+    def test_pack_command_output_reads_back_through_counts(self):
+        subprocess.check_call([sys.executable, counts_script, 'pack', '-d', self.tree, '-o', self.archive_path],
+                              stderr=subprocess.DEVNULL)
+        output_path = os.path.join(self.temp_dir, 'counts.tsv')
+        subprocess.check_call([sys.executable, counts_script, '-d', self.archive_path, '-o', output_path])
+
+        expected_df = generate_merged_df(self.tree, None)
+        self.assertEqual(expected_df.to_csv(sep='\t', index=False), pd.read_csv(
+            output_path, sep='\t', dtype={'chr': str, 'pos': str}).to_csv(sep='\t', index=False))
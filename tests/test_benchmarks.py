@@ -0,0 +1,31 @@
+import shutil
+import tempfile
+from unittest import TestCase
+
+from benchmarks.pipeline import compare
+from benchmarks.synthetic import make_run_tree
+from core.utils.directory_parsers import TopLevelDirectory
+
+
+class SyntheticTreeTest(TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_generated_tree_matches_directory_patterns(self):
+        n_files = make_run_tree(self.temp_dir, timepoints=('48hr', '12d'), samples=('A', 'C'), oligos=('1A', '3only'),
+                                files_per_dir=3)
+
+        top_level_directory = TopLevelDirectory(self.temp_dir)
+        self.assertEqual(2 * 2 * 2 * 2 * 3, n_files)
+        self.assertEqual(n_files, len(top_level_directory.mutation_files))
+        self.assertEqual(2, len(top_level_directory.first_level_subdirectories))
+
+    def test_flags_stages_slower_than_tolerance(self):
+        baseline = {'stages': {'parsing': {'seconds': 1.0}, 'merging': {'seconds': 1.0}}}
+        result = {'stages': {'parsing': {'seconds': 1.5}, 'merging': {'seconds': 1.1}, 'writing': {'seconds': 1.0}}}
+
+        self.assertEqual([('parsing', 1.5)], compare(result, baseline, 1.25))
@@ -0,0 +1,100 @@
+import io
+import os
+from contextlib import redirect_stderr
+
+from core.utils.result_cache import ResultCache
+from counts import (counts_main, generate_grouped_dfs, generate_merged_df, grouping_output_path, parse_groupings,
+                    split_into_chunks)
+from tests.helpers import RunTreeTestCase, header
+
+
+class GenerateMergedDfTest(RunTreeTestCase):
+
+    def test_splits_records_into_contiguous_chunks(self):
+        self.assertEqual([[0, 1, 2], [3, 4, 5], [6]], split_into_chunks(list(range(7)), 3))
+        self.assertEqual([[0], [1]], split_into_chunks([0, 1], 8))
+        self.assertEqual([], split_into_chunks([], 4))
+
+    def test_parallel_output_is_identical_to_serial_output(self):
+        serial_tsv = generate_merged_df(self.tree, None).to_csv(sep='\t', index=False)
+
+        for jobs in (2, 3):
+            parallel_tsv = generate_merged_df(self.tree, None, jobs=jobs).to_csv(sep='\t', index=False)
+            self.assertEqual(serial_tsv, parallel_tsv)
+
+    def test_streaming_output_is_identical_to_merged_output(self):
+        for grouping in (None, ['oligo'], ['sample', 'mutation']):
+            merged_tsv = generate_merged_df(self.tree, grouping).to_csv(sep='\t', index=False)
+            streamed_tsv = generate_merged_df(self.tree, grouping, streaming=True).to_csv(sep='\t', index=False)
+            self.assertEqual(merged_tsv, streamed_tsv)
+
+        parallel_streamed_tsv = generate_merged_df(self.tree, None, jobs=2, streaming=True).to_csv(
+            sep='\t', index=False)
+        self.assertEqual(generate_merged_df(self.tree, None).to_csv(sep='\t', index=False), parallel_streamed_tsv)
+
+    def test_cached_rerun_only_parses_new_files(self):
+        expected_tsv = generate_merged_df(self.tree, ['oligo']).to_csv(sep='\t', index=False)
+        cache_dir = os.path.join(self.temp_dir, 'cache')
+
+        cache = ResultCache(cache_dir)
+        self.assertEqual(expected_tsv, generate_merged_df(self.tree, ['oligo'], cache=cache).to_csv(
+            sep='\t', index=False))
+        cache.save()
+        n_files = cache.misses
+
+        new_dir = os.path.join(self.tree, '96hr_final', 'vcfs_96hr_A', 'vcfs_96hr_A_oligo2', 'DELETERIOUS')
+        os.makedirs(new_dir)
+        with open(os.path.join(new_dir, 'mut_id1_4.txt'), 'w') as f:
+            f.write(header)
+            f.write('17_7578424_A/C\t0.0\tdeleterious\t0.5\tpossibly_damaging\tDELETERIOUS\n')
+
+        cache = ResultCache(cache_dir)
+        cached_tsv = generate_merged_df(self.tree, None, cache=cache, jobs=2).to_csv(sep='\t', index=False)
+        self.assertEqual((n_files, 1), (cache.hits, cache.misses))
+        self.assertEqual(generate_merged_df(self.tree, None).to_csv(sep='\t', index=False), cached_tsv)
+
+    def test_cache_is_not_combined_with_a_saved_manifest(self):
+        manifest_path = os.path.join(self.temp_dir, 'manifest.tsv')
+        generate_merged_df(self.tree, None, manifest_path=manifest_path)
+        with self.assertRaises(ValueError):
+            generate_merged_df(self.tree, None, manifest_path=manifest_path,
+                               cache=ResultCache(os.path.join(self.temp_dir, 'cache')))
+
+    def test_cache_maintenance_flags_need_a_cache(self):
+        output = os.path.join(self.temp_dir, 'counts.tsv')
+        for flag in ('--invalidate-cache', '--prune-cache'):
+            stderr = io.StringIO()
+            with redirect_stderr(stderr), self.assertRaises(SystemExit):
+                counts_main(['-d', self.tree, '-o', output, flag])
+            self.assertIn('{} needs --cache'.format(flag), stderr.getvalue())
+        self.assertFalse(os.path.exists(output))
+
+    def test_saved_manifest_is_only_reused_for_its_own_tree(self):
+        manifest_path = os.path.join(self.temp_dir, 'manifest.tsv')
+        expected_tsv = generate_merged_df(self.tree, None, manifest_path=manifest_path).to_csv(sep='\t', index=False)
+        self.assertEqual(expected_tsv, generate_merged_df(os.path.join(self.tree, '.'), None,
+                                                          manifest_path=manifest_path).to_csv(sep='\t', index=False))
+
+        other_tree = os.path.join(self.temp_dir, 'other')
+        os.makedirs(other_tree)
+        with self.assertRaisesRegex(ValueError, 'lists files outside'):
+            generate_merged_df(other_tree, None, manifest_path=manifest_path)
+
+    def test_rolls_up_each_grouping_from_one_scan(self):
+        groupings = [None, ['oligo'], ['sample', 'mutation']]
+        grouped_dfs = generate_grouped_dfs(self.tree, groupings)
+
+        for grouping, grouped_df in zip(groupings, grouped_dfs):
+            self.assertEqual(generate_merged_df(self.tree, grouping).to_csv(sep='\t', index=False),
+                             grouped_df.to_csv(sep='\t', index=False))
+
+    def test_names_output_per_grouping(self):
+        self.assertEqual('counts.oligo.tsv', grouping_output_path('counts.tsv', ['oligo']))
+        self.assertEqual('counts.full.tsv.gz', grouping_output_path('counts.tsv.gz', None))
+        self.assertEqual('counts.sample_oligo', grouping_output_path('counts', ['sample', 'oligo'], 'parquet'))
+
+    def test_parses_repeated_groupby_options(self):
+        self.assertEqual([None], parse_groupings(None))
+        self.assertEqual([None, ['oligo']], parse_groupings([['full'], ['oligo']]))
+        with self.assertRaises(ValueError):
+            parse_groupings([['full', 'oligo']])
@@ -0,0 +1,65 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from core.utils.directory_parsers import TopLevelDirectory
+from core.utils.manifest import Manifest, MutationFileRecord
+
+test_dir = os.path.dirname(os.path.realpath(__file__))
+resource_dir = os.path.join(test_dir, 'resources')
+
+
+class ManifestTest(TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_parses_record_from_path(self):
+        path = os.path.join('/my/fake/dir', '12d_final2', 'vcfs_12d_C', 'vcfs_12d_C_oligo3only', 'NON-DELETERIOUS',
+                            'mut_id27_14.txt')
+        record = MutationFileRecord.from_path(path, 120)
+
+        self.assertEqual(
+            MutationFileRecord(path, '12d', 'C', '3only', 'NON-DELETERIOUS', 27, 14, 120), record)
+        self.assertEqual('12d_C', record.sample)
+
+    def test_records_use_slots(self):
+        record = MutationFileRecord('a', '48hr', 'A', '2', 'DELETERIOUS', 1, 1)
+        with self.assertRaises(AttributeError):
+            record.extra = 1
+
+    def test_builds_manifest_from_directory(self):
+        mutation_dir = os.path.join(self.temp_dir, '48hr_final', 'vcfs_48hr_C', 'vcfs_48hr_C_oligo1A', 'DELETERIOUS')
+        os.makedirs(mutation_dir)
+        shutil.copy(os.path.join(resource_dir, 'mut_id8_3.txt'), mutation_dir)
+
+        manifest = TopLevelDirectory(self.temp_dir).manifest
+        file_path = os.path.join(mutation_dir, 'mut_id8_3.txt')
+        stat_result = os.stat(file_path)
+
+        self.assertEqual(
+            [MutationFileRecord(file_path, '48hr', 'C', '1A', 'DELETERIOUS', 8, 3, stat_result.st_size,
+                                stat_result.st_mtime_ns)],
+            manifest.records
+        )
+
+    def test_saved_manifest_can_be_reloaded(self):
+        manifest = Manifest([
+            MutationFileRecord('/a/vcfs_48hr_A_oligo2/DELETERIOUS/mut_id1_2.txt', '48hr', 'A', '2', 'DELETERIOUS',
+                               1, 2, 10, 1543017600000000000),
+            MutationFileRecord('/a/vcfs_12d_B_oligo1G/NON-DELETERIOUS/mut_id13_1.txt', '12d', 'B', '1G',
+                               'NON-DELETERIOUS', 13, 1, 25),
+        ])
+        manifest_path = os.path.join(self.temp_dir, 'manifest.tsv')
+        manifest.save(manifest_path)
+
+        self.assertEqual(manifest.records, Manifest.load(manifest_path).records)
+
+    def test_rejects_files_that_are_not_manifests(self):
+        other_path = os.path.join(resource_dir, 'mut_id8_3.txt')
+        with self.assertRaises(ValueError):
+            Manifest.load(other_path)
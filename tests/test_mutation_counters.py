@@ -1,9 +1,13 @@
+import os
+import tempfile
 from unittest import TestCase
 from unittest.mock import patch
 
 from pandas import DataFrame
 
-from core.utils.mutation_counters import convert_mutation_file_to_dataframe, merge_dataframes, os
+from core.utils.manifest import MutationFileRecord
+from core.utils.mutation_counters import (convert_mutation_file_to_dataframe, merge_dataframes, parse_variant_rows,
+                                          read_mutation_file, read_variant_rows)
 
 test_dir = os.path.dirname(os.path.realpath(__file__))
 resource_dir = os.path.join(test_dir, 'resources')
@@ -55,3 +59,48 @@ class DataframeTest(TestCase):
         merged_df = merge_dataframes([DataFrame(dict(zip(headers, row)), index=[0]) for row in [row1, row2]], ['oligo'])
 
         self.assertTrue(expected_df.equals(merged_df))
+
+    def test_merges_generator_in_batches_without_changing_result(self):
+        headers = ['chr', 'pos', 'ref', 'alt', 'sample', 'oligo', 'mutation', 'count']
+        rows = [
+            ['17', '7578439', 'T', 'G', '48hr_C', '1A', 'DELETERIOUS', 1],
+            ['17', '7578424', 'A', 'C', '48hr_C', '1A', 'DELETERIOUS', 4],
+            ['17', '7578439', 'T', 'G', '48hr_C', '1A', 'DELETERIOUS', 2],
+            ['17', '7578424', 'A', 'C', '12d_B', '2', 'DELETERIOUS', 3],
+            ['17', '7578424', 'A', 'C', '48hr_C', '1A', 'DELETERIOUS', 5],
+        ]
+        df_list = [DataFrame(dict(zip(headers, row)), index=[0]) for row in rows]
+
+        expected_df = merge_dataframes(df_list, batch_size=len(rows))
+        for batch_size in (1, 2):
+            merged_df = merge_dataframes((df for df in df_list), batch_size=batch_size)
+            self.assertTrue(expected_df.equals(merged_df))
+        self.assertEqual(len(rows), len(df_list))
+        self.assertEqual([3, 9, 3], list(expected_df['count']))
+
+    def test_merging_nothing_returns_empty_dataframe(self):
+        merged_df = merge_dataframes([], ['oligo'])
+        self.assertEqual(['chr', 'pos', 'ref', 'alt', 'oligo', 'count'], list(merged_df.columns))
+        self.assertEqual(0, merged_df.shape[0])
+
+    def test_reads_variant_rows_without_barcodes(self):
+        rows = read_variant_rows(os.path.join(resource_dir, 'mut_id27_1.txt'))
+        self.assertEqual([('17', '7578439', 'T', 'G', 'DELETERIOUS')], rows)
+
+    def test_empty_files_are_rejected_as_having_no_header(self):
+        with self.assertRaisesRegex(ValueError, 'mutation file has no header'):
+            parse_variant_rows([])
+        with tempfile.NamedTemporaryFile(suffix='.txt') as empty_file:
+            with self.assertRaisesRegex(ValueError, '{} has no header'.format(empty_file.name)):
+                read_variant_rows(empty_file.name)
+
+    def test_lean_reader_matches_dataframe_converter_with_compact_dtypes(self):
+        test_file = os.path.join(resource_dir, 'mut_id8_3.txt')
+        record = MutationFileRecord(test_file, '48hr', 'C', '1A', 'DELETERIOUS', 8, 3)
+
+        lean_df = read_mutation_file(record)
+        self.assertEqual(['chr', 'pos', 'ref', 'alt', 'sample', 'oligo', 'mutation', 'count'], list(lean_df.columns))
+        self.assertEqual(['17', 7578424, 'A', 'C', '48hr_C', '1A', 'DELETERIOUS', 3], lean_df.iloc[0].tolist())
+        self.assertEqual('int64', str(lean_df['pos'].dtype))
+        for column in ('chr', 'ref', 'alt', 'sample', 'oligo', 'mutation'):
+            self.assertEqual('category', str(lean_df[column].dtype))
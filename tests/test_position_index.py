@@ -0,0 +1,108 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from unittest import TestCase
+
+from pandas import DataFrame
+
+from core.utils.position_index import CountIndex, parse_region
+from core.utils.writers import read_counts, write_counts
+
+counts_script = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'counts.py')
+
+headers = ['chr', 'pos', 'ref', 'alt', 'sample', 'oligo', 'mutation', 'count']
+rows = [
+    ['17', '7578424', 'A', 'C', '12d_B', '1T', 'DELETERIOUS', 4],
+    ['17', '7578424', 'A', 'C', '12d_C', '1G', 'DELETERIOUS', 4],
+    ['17', '7578439', 'T', 'G', '12d_C', '1T', 'DELETERIOUS', 1],
+    ['17', '7578507', 'G', 'T', '48hr_C', '2', 'NON-DELETERIOUS', 2],
+    ['17', '7578550', 'C', 'A', '12d_C', '2', 'DELETERIOUS', 3],
+    ['17', '7578551', 'C', 'T', '12d_C', '2', 'DELETERIOUS', 5],
+    ['17', '10000000', 'C', 'T', '12d_C', '2', 'DELETERIOUS', 6],
+    ['7', '140453136', 'A', 'T', '12d_C', '1G', 'DELETERIOUS', 1],
+]
+
+
+class PositionIndexTest(TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.index_path = os.path.join(self.temp_dir, 'counts.tp53idx')
+        # merged output is in string order, where 10000000 sorts before 7578424
+        write_counts(DataFrame(sorted(rows, key=lambda row: row[:7]), columns=headers), self.index_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_parses_regions(self):
+        self.assertEqual(('chr17', 7578400, 7578550), parse_region('chr17:7578400-7578550'))
+        self.assertEqual(('17', 7578400, 7578400), parse_region('17:7,578,400'))
+        self.assertEqual(('X', None, None), parse_region('X'))
+        with self.assertRaises(ValueError):
+            parse_region('17:abc')
+
+    def test_queries_an_inclusive_region_in_one_sample(self):
+        with CountIndex(self.index_path) as count_index:
+            self.assertEqual(
+                [('17', 7578424, 'A', 'C', '12d_C', '1G', 'DELETERIOUS', 4),
+                 ('17', 7578439, 'T', 'G', '12d_C', '1T', 'DELETERIOUS', 1),
+                 ('17', 7578550, 'C', 'A', '12d_C', '2', 'DELETERIOUS', 3)],
+                count_index.query('chr17', 7578400, 7578550, sample='12d_C'))
+            self.assertEqual(5, len(count_index.query('17', 7578424, 7578550)))
+            self.assertEqual(1, len(count_index.query('17', 7578400, 7578550, sample='12d_C', oligo='2')))
+
+    def test_unknown_chromosomes_and_labels_give_no_rows(self):
+        with CountIndex(self.index_path) as count_index:
+            self.assertEqual([], count_index.query('X', 1, 10))
+            self.assertEqual([], count_index.query('17', None, None, sample='6d_A'))
+            self.assertEqual(7, len(count_index.query('17')))
+            with self.assertRaises(ValueError):
+                count_index.query('17', 1, 10, count='1')
+
+    def test_closing_with_a_live_view_leaves_the_view_readable(self):
+        with CountIndex(self.index_path) as count_index:
+            positions = count_index.arrays['pos']
+        self.assertEqual(len(rows), positions.size)
+        self.assertEqual(7578424, positions[0])
+
+    def test_rejects_archives_and_other_versions(self):
+        other_path = os.path.join(self.temp_dir, 'other.tp53idx')
+        with open(self.index_path, 'rb') as f:
+            data = f.read()
+        for other_data, message in ((b'TP53PACK' + data[8:], 'is not a position index'),
+                                    (data[:8] + b'\x02' + data[9:], 'unsupported position index version 2')):
+            with open(other_path, 'wb') as f:
+                f.write(other_data)
+            with self.assertRaisesRegex(ValueError, message):
+                CountIndex(other_path)
+
+    def test_rows_are_sorted_by_numeric_position(self):
+        df = read_counts(self.index_path)
+        self.assertEqual(['17'] * 7 + ['7'], df['chr'].tolist())
+        self.assertEqual([7578424, 7578424, 7578439, 7578507, 7578550, 7578551, 10000000], df['pos'].tolist()[:7])
+        self.assertEqual(sum(row[7] for row in rows), df['count'].sum())
+
+    def test_grouped_output_can_be_indexed(self):
+        oligo_rows = [['17', 7578424, 'A', 'C', '1T', 4], ['17', 7578439, 'T', 'G', '1T', 1]]
+        index_path = os.path.join(self.temp_dir, 'oligo.tp53idx')
+        write_counts(DataFrame(oligo_rows, columns=['chr', 'pos', 'ref', 'alt', 'oligo', 'count']), index_path)
+        with CountIndex(index_path) as count_index:
+            self.assertEqual([('17', 7578439, 'T', 'G', '1T', 1)], count_index.query('17', 7578430, 7578440))
+
+    def test_queries_take_well_under_a_millisecond(self):
+        with CountIndex(self.index_path) as count_index:
+            count_index.query('17', 7578400, 7578550, sample='12d_C')
+            start = time.perf_counter()
+            for _ in range(100):
+                count_index.query('17', 7578400, 7578550, sample='12d_C')
+            self.assertLess((time.perf_counter() - start) / 100, 1e-3)
+
+    def test_query_command_prints_matching_rows(self):
+        output = subprocess.check_output([sys.executable, counts_script, 'query', self.index_path,
+                                          'chr17:7578400-7578440', '--sample', '12d_C'])
+        self.assertEqual('chr\tpos\tref\talt\tsample\toligo\tmutation\tcount\n'
+                         '17\t7578424\tA\tC\t12d_C\t1G\tDELETERIOUS\t4\n'
+                         '17\t7578439\tT\tG\t12d_C\t1T\tDELETERIOUS\t1\n', output.decode())
@@ -0,0 +1,66 @@
+import os
+import threading
+import time
+
+from core.utils.directory_parsers import TopLevelDirectory
+from core.utils.prefetch import prefetch_files, read_bytes
+from core.utils.result_cache import ResultCache
+from counts import generate_merged_df
+from tests.helpers import RunTreeTestCase
+
+latency = 0.02
+
+
+class SlowReader:
+    """Reads files after a fixed delay, like opening small files on network storage, and tracks concurrent reads"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def __call__(self, path):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(latency)
+        with self.lock:
+            self.in_flight -= 1
+        return read_bytes(path)
+
+
+class PrefetchTest(RunTreeTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.records = TopLevelDirectory(self.tree).manifest.records
+
+    def test_yields_buffers_in_input_order(self):
+        paths = [record.path for record, _, _ in prefetch_files(self.records, threads=4, reader=SlowReader())]
+        self.assertEqual([record.path for record in self.records], paths)
+
+    def test_read_ahead_depth_is_bounded(self):
+        reader = SlowReader()
+        for _ in prefetch_files(self.records, threads=8, depth=3, reader=reader):
+            time.sleep(latency / 4)
+        self.assertLessEqual(reader.max_in_flight, 3)
+
+    def test_overlapping_reads_hide_latency(self):
+        reader = SlowReader()
+        start = time.perf_counter()
+        sequential = [reader(record.path) for record in self.records]
+        sequential_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        prefetched = [data for _, data, _ in prefetch_files(self.records, threads=8, reader=SlowReader())]
+        prefetched_seconds = time.perf_counter() - start
+
+        self.assertEqual(sequential, prefetched)
+        self.assertLess(prefetched_seconds * 3, sequential_seconds)
+
+    def test_prefetched_run_matches_sequential_run(self):
+        for grouping in (None, ['oligo']):
+            expected_tsv = generate_merged_df(self.tree, grouping).to_csv(sep='\t', index=False)
+            for options in ({}, {'cache': ResultCache(os.path.join(self.temp_dir, 'cache'))}):
+                df = generate_merged_df(self.tree, grouping, prefetch=4, **options)
+                self.assertEqual(expected_tsv, df.to_csv(sep='\t', index=False))
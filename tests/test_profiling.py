@@ -0,0 +1,70 @@
+import json
+import os
+from unittest import TestCase
+
+from core.utils.manifest import MutationFileRecord
+from core.utils.profiling import NULL_PROFILER, PipelineProfiler
+from core.utils.result_cache import ResultCache
+from counts import generate_merged_df
+from tests.helpers import RunTreeTestCase
+
+
+def make_record(path, size=100):
+    return MutationFileRecord(path, '48hr', 'C', '1A', 'DELETERIOUS', 8, 3, size)
+
+
+class ProfilerTest(TestCase):
+
+    def test_keeps_the_slowest_files(self):
+        profiler = PipelineProfiler(n_slowest=2)
+        for index, seconds in enumerate((0.3, 0.1, 0.5, 0.2)):
+            profiler.file_parsed(make_record('file{}'.format(index)), seconds, rows_read=4, barcode_rows=3)
+
+        self.assertEqual([(0.5, 'file2'), (0.3, 'file0')], profiler.slowest_files)
+        reading = profiler.stages['reading']
+        self.assertEqual((4, 16, 12, 400), (reading.files, reading.rows_read, reading.barcode_rows, reading.bytes_read))
+
+    def test_calls_stage_and_file_callbacks(self):
+        events = []
+        profiler = PipelineProfiler(on_stage=lambda name, metrics: events.append(name),
+                                    on_file=lambda record, seconds: events.append(record.path))
+        with profiler.stage('parsing'):
+            profiler.file_parsed(make_record('file0'), 0.1)
+
+        self.assertEqual(['file0', 'parsing'], events)
+
+    def test_null_profiler_accepts_stage_metrics(self):
+        with NULL_PROFILER.stage('parsing') as metrics:
+            metrics.files = 3
+        self.assertFalse(NULL_PROFILER.enabled)
+
+
+class ProfiledRunTest(RunTreeTestCase):
+
+    def test_profiled_runs_report_stages_without_changing_output(self):
+        expected_tsv = generate_merged_df(self.tree, None).to_csv(sep='\t', index=False)
+        for streaming in (False, True):
+            profiler = PipelineProfiler()
+            df = generate_merged_df(self.tree, None, streaming=streaming, profiler=profiler)
+
+            self.assertEqual(expected_tsv, df.to_csv(sep='\t', index=False))
+            self.assertEqual(['discovery', 'parsing', 'reading'], list(profiler.stages)[:3])
+            self.assertEqual(50, profiler.stages['reading'].files)
+            self.assertEqual(50, profiler.stages['reading'].barcode_rows)
+
+        json_path = os.path.join(self.temp_dir, 'profile.json')
+        profiler.save_json(json_path)
+        with open(json_path) as f:
+            self.assertEqual(10, len(json.load(f)['slowest_files']))
+
+    def test_cached_files_are_not_counted_as_parsed(self):
+        cache_dir = os.path.join(self.temp_dir, 'cache')
+        for expected_files in (50, 0):
+            profiler = PipelineProfiler()
+            cache = ResultCache(cache_dir)
+            generate_merged_df(self.tree, None, cache=cache, profiler=profiler)
+            cache.save()
+
+            parsing = profiler.stages['parsing']
+            self.assertEqual(expected_files, parsing.files)
+            self.assertEqual(expected_files > 0, parsing.bytes_read > 0)
@@ -0,0 +1,53 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from core.utils.manifest import MutationFileRecord
+from core.utils.result_cache import ResultCache
+
+contribution = [(('17', '7578424', 'A', 'C', '48hr_C', '1A', 'DELETERIOUS'), 3)]
+
+
+def make_record(path, size=10, mtime=1000):
+    return MutationFileRecord(path, '48hr', 'C', '1A', 'DELETERIOUS', 8, 3, size, mtime)
+
+
+class ResultCacheTest(TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.temp_dir, '.tp53cache')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_returns_saved_contribution_for_unchanged_file(self):
+        cache = ResultCache(self.cache_dir)
+        cache.put(make_record('/a/mut_id8_3.txt'), contribution)
+        cache.save()
+
+        reloaded_cache = ResultCache(self.cache_dir)
+        self.assertEqual(contribution, reloaded_cache.get(make_record('/a/mut_id8_3.txt')))
+        self.assertEqual((1, 0), (reloaded_cache.hits, reloaded_cache.misses))
+
+    def test_misses_when_mtime_or_size_changes(self):
+        cache = ResultCache(self.cache_dir)
+        cache.put(make_record('/a/mut_id8_3.txt'), contribution)
+
+        self.assertIsNone(cache.get(make_record('/a/mut_id8_3.txt', mtime=2000)))
+        self.assertIsNone(cache.get(make_record('/a/mut_id8_3.txt', size=11)))
+        self.assertIsNone(cache.get(make_record('/a/mut_id9_3.txt')))
+        self.assertEqual((0, 3), (cache.hits, cache.misses))
+
+    def test_invalidate_and_prune(self):
+        cache = ResultCache(self.cache_dir)
+        for path in ('/a/mut_id1_1.txt', '/a/mut_id2_1.txt', '/a/mut_id3_1.txt'):
+            cache.put(make_record(path), contribution)
+
+        cache.get(make_record('/a/mut_id1_1.txt'))
+        self.assertEqual(2, cache.prune())
+        self.assertEqual(1, len(cache))
+
+        cache.invalidate()
+        self.assertEqual(0, len(cache))
@@ -0,0 +1,73 @@
+import io
+import os
+import subprocess
+import sys
+from contextlib import redirect_stderr
+
+from core.utils.directory_parsers import TopLevelDirectory
+from core.utils.sharding import parse_shard, shard_of
+from counts import counts_main, load_manifest
+from tests.helpers import RunTreeTestCase
+
+counts_script = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'counts.py')
+
+
+class ShardingTest(RunTreeTestCase):
+
+    def test_parses_shard_specs(self):
+        self.assertEqual((2, 4), parse_shard('2/4'))
+        for spec in ('4/4', '1', 'a/b', '-1/2'):
+            with self.assertRaises(ValueError):
+                parse_shard(spec)
+
+    def test_shard_assignment_does_not_depend_on_the_process(self):
+        script = 'from core.utils.sharding import shard_of; print(shard_of("vcfs_12d_C", 7), end="")'
+        output = subprocess.check_output([sys.executable, '-c', script], cwd=os.path.dirname(counts_script))
+        self.assertEqual(str(shard_of('vcfs_12d_C', 7)), output.decode())
+
+    def test_shards_partition_the_tree(self):
+        all_paths = sorted(TopLevelDirectory(self.tree).mutation_files)
+        for n_shards in (1, 2, 3, 5):
+            shard_paths = [load_manifest(self.tree, shard=(index, n_shards)).paths for index in range(n_shards)]
+            self.assertEqual(all_paths, sorted(path for paths in shard_paths for path in paths))
+
+        manifest_path = os.path.join(self.temp_dir, 'manifest.tsv')
+        load_manifest(self.tree, manifest_path)
+        self.assertEqual(load_manifest(self.tree, shard=(1, 2)).paths,
+                         load_manifest(self.tree, manifest_path, shard=(1, 2)).paths)
+
+    def test_reduced_shards_match_a_single_process_run(self):
+        output = os.path.join(self.temp_dir, 'single.tsv')
+        groupby_args = ['--groupby', 'full', '--groupby', 'oligo', '--groupby', 'sample', 'mutation']
+        subprocess.check_call([sys.executable, counts_script, '-d', self.tree, '-o', output] + groupby_args)
+
+        n_shards = 3
+        partials = [os.path.join(self.temp_dir, 'partial.{}.tsv.gz'.format(index)) for index in range(n_shards)]
+        shard_runs = [subprocess.Popen([sys.executable, counts_script, '-d', self.tree, '-o', partial,
+                                        '--shard', '{}/{}'.format(index, n_shards)])
+                      for index, partial in enumerate(partials)]
+        self.assertEqual([0] * n_shards, [run.wait() for run in shard_runs])
+        reduced = os.path.join(self.temp_dir, 'reduced.tsv')
+        subprocess.check_call([sys.executable, counts_script, 'reduce', '-o', reduced] + partials + groupby_args)
+
+        for name in ('full', 'oligo', 'sample_mutation'):
+            with open(os.path.join(self.temp_dir, 'single.{}.tsv'.format(name))) as single_file, \
+                    open(os.path.join(self.temp_dir, 'reduced.{}.tsv'.format(name))) as reduced_file:
+                self.assertEqual(single_file.read(), reduced_file.read())
+
+    def test_reduce_rejects_grouped_files(self):
+        grouped = os.path.join(self.temp_dir, 'oligo.tsv')
+        subprocess.check_call([sys.executable, counts_script, '-d', self.tree, '-o', grouped, '--groupby', 'oligo'])
+        result = subprocess.run([sys.executable, counts_script, 'reduce', '-o', os.path.join(self.temp_dir, 'r.tsv'),
+                                 grouped], stderr=subprocess.PIPE, universal_newlines=True)
+        self.assertEqual(2, result.returncode)
+        self.assertIn('not an ungrouped partial count file', result.stderr)
+
+    def test_shard_options_are_checked_before_counting(self):
+        output = os.path.join(self.temp_dir, 'partial.tsv')
+        for extra_args, message in ((['--watch'], '--shard cannot be combined with --watch'),
+                                    (['--groupby', 'oligo'], 'use --groupby with the reduce command')):
+            stderr = io.StringIO()
+            with redirect_stderr(stderr), self.assertRaises(SystemExit):
+                counts_main(['-d', self.tree, '-o', output, '--shard', '0/2'] + extra_args)
+            self.assertIn(message, stderr.getvalue())
@@ -0,0 +1,51 @@
+import io
+import os
+import subprocess
+import sys
+
+from counts import list_files
+from tests.helpers import RunTreeTestCase
+
+repo_dir = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..')
+counts_script = os.path.join(repo_dir, 'counts.py')
+heavy_modules = ('pandas', 'numpy', 'concurrent.futures.process')
+# importing counts takes ~30 ms here, against ~550 ms when it imported pandas at load time
+import_budget_us = 150000
+
+
+def import_times(*args):
+    """Runs python -X importtime with args and returns {module: cumulative microseconds}"""
+    result = subprocess.run([sys.executable, '-X', 'importtime'] + list(args), cwd=repo_dir,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, universal_newlines=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if line.startswith('import time:') and '|' in line:
+            _, cumulative, module = line.split('|')
+            if cumulative.strip().isdigit():
+                times[module.strip()] = int(cumulative)
+    return times
+
+
+class StartupTest(RunTreeTestCase):
+
+    def test_import_stays_within_budget(self):
+        times = min((import_times('-c', 'import counts') for _ in range(3)), key=lambda times: times['counts'])
+
+        self.assertLess(times['counts'], import_budget_us)
+        self.assertEqual([], [module for module in heavy_modules if module in times])
+
+    def test_help_and_dry_run_do_not_load_pandas(self):
+        for args in (['--help'], ['-d', self.tree, '--dry-run'], ['query', '--help']):
+            times = import_times(counts_script, *args)
+            self.assertIn('core.utils.directory_parsers', times)
+            self.assertNotIn('pandas', times)
+
+    def test_lists_files_per_timepoint_sample_and_oligo(self):
+        out = io.StringIO()
+        tally = list_files(self.tree, out)
+
+        self.assertEqual(50, sum(tally.values()))
+        lines = out.getvalue().splitlines()
+        self.assertEqual('timepoint\tsample\toligo\tDELETERIOUS\tNON-DELETERIOUS\tfiles', lines[0])
+        self.assertEqual('12d\t12d_B\t1T\t5\t5\t10', lines[1])
+        self.assertEqual('50 files', lines[-1])
@@ -0,0 +1,77 @@
+from unittest import TestCase
+
+import numpy as np
+from pandas import DataFrame
+
+from core.utils.mutation_counters import get_grouping_columns, merge_dataframes
+from core.utils.variant_encoding import EncodedCounts, NotEncodableError, aggregate_encoded
+
+headers = ['chr', 'pos', 'ref', 'alt', 'sample', 'oligo', 'mutation', 'count']
+
+
+def random_rows(n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    positions = ['7578424', '7578439', '140453136', '99', '153296777']
+    return DataFrame({
+        'chr': rng.choice(['17', '7', 'X', '2'], n_rows),
+        'pos': rng.choice(positions, n_rows),
+        'ref': rng.choice(list('ACGT'), n_rows),
+        'alt': rng.choice(list('ACGT'), n_rows),
+        'sample': rng.choice(['48hr_C', '12d_B', '6d_A'], n_rows),
+        'oligo': rng.choice(['1A', '2', '3only'], n_rows),
+        'mutation': rng.choice(['DELETERIOUS', 'NON-DELETERIOUS'], n_rows),
+        'count': rng.integers(1, 30, n_rows)
+    }, columns=headers)
+
+
+class VariantEncodingTest(TestCase):
+
+    def test_matches_pandas_groupby(self):
+        df = random_rows(500)
+        for group_criteria in (None, ['oligo'], ['mutation', 'sample']):
+            grouping = get_grouping_columns(group_criteria)
+            expected_df = df.groupby(grouping, as_index=False)['count'].sum()
+            self.assertTrue(expected_df.equals(aggregate_encoded(df, grouping)))
+
+    def test_matches_pandas_groupby_with_integer_positions(self):
+        df = random_rows(200).astype({'pos': 'int64'})
+        grouping = get_grouping_columns(['sample'])
+        expected_df = df.groupby(grouping, as_index=False)['count'].sum()
+        self.assertTrue(expected_df.equals(aggregate_encoded(df, grouping)))
+
+    def test_running_totals_match_single_aggregation(self):
+        df = random_rows(300)
+        grouping = get_grouping_columns()
+        encoded_counts = EncodedCounts(grouping)
+        for start in range(0, 300, 70):
+            encoded_counts.add(df.iloc[start:start + 70])
+
+        self.assertTrue(aggregate_encoded(df, grouping).equals(encoded_counts.to_dataframe()))
+
+    def test_rejects_indels(self):
+        df = DataFrame([['17', '7578424', 'AT', 'A', '48hr_C', '1A', 'DELETERIOUS', 1]], columns=headers)
+        with self.assertRaises(NotEncodableError):
+            aggregate_encoded(df, get_grouping_columns())
+
+    def test_merge_falls_back_to_pandas_for_unencodable_batches(self):
+        rows = [
+            ['17', '7578424', 'A', 'C', '48hr_C', '1A', 'DELETERIOUS', 4],
+            ['17', '7578424', 'AT', 'A', '48hr_C', '1A', 'DELETERIOUS', 2],
+            ['17', '7578424', 'A', 'C', '48hr_C', '1A', 'DELETERIOUS', 1],
+        ]
+        df_list = [DataFrame([row], columns=headers) for row in rows]
+        expected_df = DataFrame(rows, columns=headers).groupby(get_grouping_columns(), as_index=False)['count'].sum()
+
+        self.assertTrue(expected_df.equals(merge_dataframes(df_list, batch_size=1)))
+
+    def test_merges_categorical_frames_across_batches(self):
+        rows = [['17', '7578424', 'A', 'C', '48hr_C', '1A', 'DELETERIOUS', 4],
+                ['17', '7578439', 'T', 'G', '12d_B', '2', 'NON-DELETERIOUS', 1],
+                ['X', '153296777', 'G', 'A', '6d_A', '3only', 'DELETERIOUS', 2]]
+        plain_frames = [DataFrame([row], columns=headers) for row in rows]
+        frames = [frame.astype({column: 'category' for column in headers[:7]}) for frame in plain_frames]
+
+        merged_df = merge_dataframes(frames, batch_size=1)
+        self.assertFalse(merged_df.isna().any().any())
+        self.assertEqual(merge_dataframes(plain_frames).to_csv(sep='\t', index=False),
+                         merged_df.to_csv(sep='\t', index=False))
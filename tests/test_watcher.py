@@ -0,0 +1,129 @@
+import io
+import os
+import shutil
+import time
+from contextlib import redirect_stderr
+from unittest.mock import patch
+
+from core.utils.watcher import IncrementalCounts, TreeWatcher
+from core.utils.writers import read_counts
+from counts import generate_merged_df, watch
+from tests.helpers import RunTreeTestCase, header, variants
+
+groupings = [None, ['oligo'], ['sample', 'mutation']]
+
+
+def settle(root):
+    """Moves every directory's mtime into the past, as for a tree that has not changed for a while"""
+    past = time.time() - 100
+    for directory, _, _ in os.walk(root):
+        os.utime(directory, (past, past))
+
+
+def write_mutation_file(path, variant_indexes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write(header)
+        for variant_index in variant_indexes:
+            f.write('{}\t0.0\tdeleterious\t0.5\tpossibly_damaging\tDELETERIOUS\n'.format(variants[variant_index]))
+
+
+class IncrementalCountsTest(RunTreeTestCase):
+
+    def setUp(self):
+        super().setUp()
+        settle(self.tree)
+        self.counts = IncrementalCounts(self.tree, groupings)
+        self.mutation_dir = os.path.join(self.tree, '48hr_final', 'vcfs_48hr_C', 'vcfs_48hr_C_oligo2',
+                                         'DELETERIOUS')
+
+    def assertMatchesFullRun(self):
+        for grouping, df in zip(groupings, self.counts.to_dataframes()):
+            expected_tsv = generate_merged_df(self.tree, grouping).to_csv(sep='\t', index=False)
+            self.assertEqual(expected_tsv, df.to_csv(sep='\t', index=False))
+
+    def test_first_update_counts_every_file(self):
+        self.assertEqual((50, 0), self.counts.update())
+        self.assertMatchesFullRun()
+
+    def test_unchanged_tree_is_not_listed_again(self):
+        self.counts.update()
+        self.assertEqual((0, 0), self.counts.update())
+        self.assertEqual(0, self.counts.watcher.listings)
+
+    def test_new_files_are_the_only_ones_parsed(self):
+        self.counts.update()
+        write_mutation_file(os.path.join(self.mutation_dir, 'mut_id9_2.txt'), [0, 5])
+        new_oligo_dir = os.path.join(self.tree, '48hr_final', 'vcfs_48hr_C', 'vcfs_48hr_C_oligo1A')
+        write_mutation_file(os.path.join(new_oligo_dir, 'NON-DELETERIOUS', 'mut_id1_3.txt'), [6])
+
+        self.assertEqual((2, 0), self.counts.update())
+        self.assertEqual(3, self.counts.watcher.listings)
+        self.assertMatchesFullRun()
+
+    def test_files_that_cannot_be_read_yet_are_retried(self):
+        self.counts.update()
+        new_path = os.path.join(self.mutation_dir, 'mut_id9_2.txt')
+        open(new_path, 'w').close()
+        settle(self.tree)
+        for _ in range(2):
+            stderr = io.StringIO()
+            with redirect_stderr(stderr):
+                self.assertEqual((1, 0), self.counts.update())
+            self.assertIn('skipping {}'.format(new_path), stderr.getvalue())
+            self.assertNotIn(new_path, self.counts.contributions)
+
+        write_mutation_file(new_path, [0, 5])
+        self.assertEqual((1, 0), self.counts.update())
+        self.assertEqual((0, 0), self.counts.update())
+        self.assertMatchesFullRun()
+
+    def test_files_removed_after_listing_are_skipped(self):
+        removed_path = os.path.join(self.mutation_dir, 'mut_id9_2.txt')
+        list_entries = TreeWatcher._list
+
+        def list_with_removed_file(watcher, path, *args, **kwargs):
+            return list_entries(watcher, path, *args, **kwargs) + ([removed_path] if path == self.mutation_dir else [])
+
+        with patch.object(TreeWatcher, '_list', list_with_removed_file), redirect_stderr(io.StringIO()) as stderr:
+            self.assertEqual((50, 0), self.counts.update())
+        self.assertIn('skipping {}'.format(removed_path), stderr.getvalue())
+        self.assertMatchesFullRun()
+
+    def test_directories_removed_after_listing_count_as_removed(self):
+        self.counts.update()
+        sample_dir, removed_dir = os.path.split(os.path.dirname(self.mutation_dir))
+        shutil.rmtree(os.path.join(sample_dir, removed_dir))
+        list_entries = TreeWatcher._list
+
+        def list_with_removed_dir(watcher, path, *args, **kwargs):
+            entries = list_entries(watcher, path, *args, **kwargs)
+            return sorted(entries + [os.path.join(sample_dir, removed_dir)]) if path == sample_dir else entries
+
+        with patch.object(TreeWatcher, '_list', list_with_removed_dir):
+            self.assertEqual((0, 10), self.counts.update())
+        self.assertMatchesFullRun()
+
+    def test_changed_and_removed_files_are_taken_back_out(self):
+        self.counts.update()
+        file_names = sorted(os.listdir(self.mutation_dir))
+        os.remove(os.path.join(self.mutation_dir, file_names[0]))
+        write_mutation_file(os.path.join(self.mutation_dir, file_names[1]), [1, 2, 3])
+        self.assertEqual((1, 1), self.counts.update(full=True))
+        self.assertMatchesFullRun()
+
+        shutil.rmtree(os.path.join(self.tree, '12d_final2'))
+        self.assertEqual((0, 30), self.counts.update())
+        self.assertMatchesFullRun()
+
+
+class WatchTest(RunTreeTestCase):
+
+    def test_writes_every_grouping(self):
+        output_paths = [os.path.join(self.temp_dir, 'full.tsv'), os.path.join(self.temp_dir, 'oligo.tsv')]
+        counts = watch(self.tree, [None, ['oligo']], output_paths, interval=0, max_updates=2)
+
+        self.assertEqual(50, len(counts.contributions))
+        self.assertEqual(['full.tsv', 'oligo.tsv', 'tree'], sorted(os.listdir(self.temp_dir)))
+        for grouping, output_path in zip([None, ['oligo']], output_paths):
+            self.assertEqual(generate_merged_df(self.tree, grouping).shape, read_counts(output_path).shape)
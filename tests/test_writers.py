@@ -0,0 +1,62 @@
+import importlib.util
+import os
+import shutil
+import tempfile
+from unittest import TestCase, skipUnless
+
+from pandas import DataFrame
+
+from core.utils.writers import infer_format, read_counts, write_counts
+
+has_pyarrow = importlib.util.find_spec('pyarrow') is not None
+
+headers = ['chr', 'pos', 'ref', 'alt', 'sample', 'oligo', 'mutation', 'count']
+rows = [
+    ['17', '7578424', 'A', 'C', '12d_B', '1T', 'DELETERIOUS', 4],
+    ['17', '7578439', 'T', 'G', '48hr_C', '2', 'NON-DELETERIOUS', 1],
+]
+
+
+class WritersTest(TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.df = DataFrame(rows, columns=headers)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_infers_format_from_extension(self):
+        self.assertEqual('tsv.gz', infer_format('output.tsv.gz'))
+        self.assertEqual('parquet', infer_format('output.parquet'))
+        self.assertEqual('tsv', infer_format('output.txt'))
+
+    def test_tsv_output_is_unchanged(self):
+        output_path = os.path.join(self.temp_dir, 'output.tsv')
+        write_counts(self.df, output_path)
+
+        with open(output_path) as f:
+            self.assertEqual(self.df.to_csv(sep='\t', index=False), f.read())
+
+    def test_round_trips_each_format(self):
+        formats = ['tsv', 'tsv.gz', 'tp53idx'] + (['parquet', 'feather'] if has_pyarrow else [])
+        for output_format in formats:
+            output_path = os.path.join(self.temp_dir, 'output.' + output_format)
+            write_counts(self.df, output_path, output_format)
+            df = read_counts(output_path)
+            self.assertEqual(rows[1][1:], df.astype({'pos': str}).iloc[1].tolist()[1:])
+            self.assertEqual('int64', str(df['count'].dtype))
+
+    @skipUnless(has_pyarrow, 'pyarrow is not installed')
+    def test_binary_formats_use_compact_dtypes(self):
+        output_path = os.path.join(self.temp_dir, 'output.parquet')
+        write_counts(self.df, output_path)
+        df = read_counts(output_path)
+
+        self.assertEqual('int64', str(df['pos'].dtype))
+        for column in ('sample', 'oligo', 'mutation'):
+            self.assertEqual('category', str(df[column].dtype))
+
+    def test_rejects_unknown_format(self):
+        with self.assertRaises(ValueError):
+            write_counts(self.df, os.path.join(self.temp_dir, 'output.xlsx'), 'xlsx')